@@ -0,0 +1,78 @@
+"""
+Compare memory and throughput of the dict-per-transaction layout with the column Ledger.
+
+    python3 -m benchmarks.ledger_layout --rows 1000000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from operations.ledger import Ledger
+
+
+def generate_rows(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    date = datetime(2024, 1, 1)
+    balance = 0.0
+    for seq in range(1, count + 1):
+        if rng.random() < 0.3:
+            date += timedelta(days=1)
+        amount = rng.randint(1, 100000) / 100
+        txn_type = 'W' if balance > amount and rng.random() < 0.4 else 'D'
+        balance += -amount if txn_type == 'W' else amount
+        yield date, seq, txn_type, amount, balance
+
+
+def load_dicts(rows):
+    transactions = []
+    for date, seq, txn_type, amount, balance in rows:
+        transactions.append({"date": date, "id": f"{date.strftime('%Y%m%d')}-{seq}", "type": txn_type,
+                             "amount": amount, "current_balance": balance})
+    return transactions
+
+
+def load_ledger(rows):
+    ledger = Ledger()
+    for date, seq, txn_type, amount, balance in rows:
+        ledger.insert(date.toordinal(), seq, txn_type, round(amount * 100))
+    return ledger
+
+
+def scan_dicts(transactions):
+    return sum(txn['amount'] for txn in transactions if txn['type'] == 'W')
+
+
+def scan_ledger(ledger):
+    withdrawal = 1
+    return sum(amount for amount, code in zip(ledger.amounts, ledger.types) if code == withdrawal) / 100
+
+
+def measure(load, scan, rows):
+    tracemalloc.start()
+    started = time.perf_counter()
+    store = load(rows)
+    load_seconds = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    started = time.perf_counter()
+    scan(store)
+    scan_seconds = time.perf_counter() - started
+    return memory, load_seconds, scan_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args()
+    rows = list(generate_rows(args.rows))
+    print(f"{'Layout':<10}{'Memory (MB)':>14}{'Bytes/row':>12}{'Load rows/s':>14}{'Scan rows/s':>14}")
+    for name, load, scan in (('dict', load_dicts, scan_dicts), ('ledger', load_ledger, scan_ledger)):
+        memory, load_seconds, scan_seconds = measure(load, scan, rows)
+        print(f"{name:<10}{memory / 2 ** 20:>14.1f}{memory / args.rows:>12.1f}"
+              f"{args.rows / load_seconds:>14,.0f}{args.rows / scan_seconds:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Load-test a running server with concurrent clients and report requests per second.
+
+    python3 run_server.py --port 8765 &
+    python3 -m benchmarks.load_client --port 8765 --clients 50 --requests 2000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+
+async def client(host: str, port: int, path: str, requests: list, latencies: list) -> int:
+    """
+    Send requests one at a time over one connection
+    :return: Number of ERROR responses
+    """
+    if path:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    errors = 0
+    for request in requests:
+        started = time.perf_counter()
+        writer.write(request.encode() + b'\n')
+        await writer.drain()
+        while (line := await reader.readline()) not in (b'\n', b''):
+            errors += line.startswith(b'ERROR')
+        latencies.append(time.perf_counter() - started)
+    writer.write(b'Q\n')
+    writer.close()
+    return errors
+
+
+def generate_requests(rng: random.Random, count: int, accounts: int) -> list:
+    """Mostly deposits and withdrawals over many accounts, with a few statements and rule changes"""
+    requests = []
+    for _ in range(count):
+        kind = rng.random()
+        account = f"AC{rng.randrange(accounts):05d}"
+        day = f"2024{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}"
+        if kind < 0.001:
+            requests.append(f"I {day} RULE{rng.randrange(100):03d} {rng.randint(50, 500) / 100:.2f}")
+        elif kind < 0.05:
+            requests.append(f"P {account} 2024{rng.randint(1, 12):02d}")
+        elif kind < 0.3:
+            requests.append(f"T {day} {account} w {rng.randint(1, 5000) / 100:.2f}")
+        else:
+            requests.append(f"T {day} {account} d {rng.randint(1, 100000) / 100:.2f}")
+    return requests
+
+
+async def run(args) -> None:
+    rng = random.Random(args.seed)
+    latencies = []
+    batches = [generate_requests(rng, args.requests, args.accounts) for _ in range(args.clients)]
+    started = time.perf_counter()
+    errors = await asyncio.gather(*(client(args.host, args.port, args.unix, batch, latencies) for batch in batches))
+    elapsed = time.perf_counter() - started
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(f"{len(latencies)} requests from {args.clients} clients in {elapsed:.2f}s: "
+          f"{len(latencies) / elapsed:,.0f} requests/s, p50 {percentiles[49] * 1e3:.2f}ms, "
+          f"p99 {percentiles[98] * 1e3:.2f}ms, {sum(errors)} ERROR responses")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='Connect to this Unix socket path instead of TCP')
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per client')
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
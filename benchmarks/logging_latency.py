@@ -0,0 +1,57 @@
+"""
+Measure handle_transaction latency with synchronous log handlers, the queued handler and quiet mode.
+
+    python3 -m benchmarks.logging_latency --transactions 20000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from logger import logger, listener, console_handler, file_handler, flush_logger
+from main import BankSystem
+
+
+def run(transactions: int, accounts: int, quiet: bool) -> list:
+    rng = random.Random(11)
+    bank_system = BankSystem()
+    bank_system.quiet = quiet
+    latencies = []
+    for index in range(transactions):
+        month = 1 + index * 12 // transactions
+        txn = f"2024{month:02d}01 AC{rng.randrange(accounts)} d {rng.randint(1, 9999)}.{rng.randint(0, 99):02d}"
+        started = time.perf_counter()
+        bank_system.handle_transaction(txn)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--transactions', type=int, default=20000)
+    parser.add_argument('--accounts', type=int, default=2000)
+    args = parser.parse_args()
+    with open(os.devnull, 'w') as console, tempfile.TemporaryFile('w') as log_file:
+        console_handler.setStream(console)
+        file_handler.setStream(log_file)
+        queue_handlers = logger.handlers[:]
+        results = {}
+        listener.stop()
+        logger.handlers = [file_handler, console_handler]
+        results['synchronous'] = run(args.transactions, args.accounts, quiet=False)
+        logger.handlers = queue_handlers
+        listener.start()
+        results['queued'] = run(args.transactions, args.accounts, quiet=False)
+        flush_logger()
+        results['quiet'] = run(args.transactions, args.accounts, quiet=True)
+        flush_logger()
+    print(f"{'Mode':<14}{'p50 (us)':>12}{'p99 (us)':>12}{'Total (s)':>12}")
+    for mode, latencies in results.items():
+        percentiles = statistics.quantiles(latencies, n=100)
+        print(f"{mode:<14}{percentiles[49] * 1e6:>12.1f}{percentiles[98] * 1e6:>12.1f}{sum(latencies):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare the memory and SQLite storage backends on the same seeded workload.
+
+    python3 -m benchmarks.storage_backends --scale small
+    python3 -m benchmarks.storage_backends --scale medium --db /tmp/bank.db
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+from datetime import datetime
+
+from benchmarks.suite import print_report, summarize, timed
+from benchmarks.workload import SCALES, generate_rules, generate_statements, generate_transactions, month_starts
+from logger import logger
+from main import BankSystem
+from operations.storage import SqliteStorage
+
+
+def run_backend(storage, scale: str, seed: int) -> dict:
+    """
+    Time loading, limit checks, statements, range statements and month-end interest on one backend
+    :param storage: None for the memory storage
+    :param scale: Key of SCALES
+    :param seed
+    """
+    config = SCALES[scale]
+    rng = random.Random(seed)
+    bank_system = BankSystem(storage=storage)
+    bank_system.quiet = True
+    months = [datetime.combine(start, datetime.min.time()) for start in month_starts(config['months'])]
+    results = {}
+    for rule in generate_rules(rng, config['rules'], config['months']):
+        bank_system.define_interest_rule(rule)
+    transactions = generate_transactions(rng, config['accounts'], config['transactions'], config['months'])
+    results['handle_transaction'] = summarize(timed(bank_system.handle_transaction, transactions))
+    accounts = sorted(bank_system.accounts)
+    checks = [(rng.choice(accounts), datetime.combine(rng.choice(months), datetime.min.time()))
+              for _ in range(config['statements'])]
+    results['get_daily_withdrawals'] = summarize(timed(lambda check: bank_system.get_daily_withdrawals(*check),
+                                                       checks))
+    statements = generate_statements(rng, config['accounts'], config['statements'], config['months'])
+    results['get_statement'] = summarize(timed(bank_system.get_statement, statements))
+    ranges = [f"{statement.split()[0]} YTD {statement.split()[1]}" for statement in statements]
+    results['get_range_statement'] = summarize(timed(bank_system.get_range_statement, ranges))
+    results['calculate_eom_interest'] = summarize(timed(bank_system.calculate_eom_interest, months))
+    bank_system.close_storage()
+    return {"results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db', help='SQLite database file, a temporary file when omitted')
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)  # Time the operations, not the console
+    memory = run_backend(None, args.scale, args.seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.db or os.path.join(tmp_dir, 'bank.db')
+        sqlite = run_backend(SqliteStorage(path), args.scale, args.seed)
+        size = os.path.getsize(path) / 2 ** 20
+    print('memory')
+    print_report(memory)
+    print(f'\nsqlite ({size:.1f} MB database), speed relative to memory')
+    print_report(sqlite, memory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark suite timing transactions, rule changes, statements and month-end runs on a seeded workload.
+
+    python3 -m benchmarks.suite --scale medium --output results.json
+    python3 -m benchmarks.suite --scale medium --compare results.json
+"""
+import argparse
+import json
+import logging
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+from benchmarks.workload import (SCALES, generate_rules, generate_statements, generate_transactions,
+                                 month_starts)
+from constants import EOM_WORKERS
+from logger import logger
+from main import BankSystem
+
+
+def timed(operation, inputs) -> dict:
+    """
+    Call operation on every input, timing each call
+    :param operation
+    :param inputs
+    :return: Latencies in seconds and the number of calls that raised
+    """
+    latencies, errors = [], 0
+    for value in inputs:
+        started = time.perf_counter()
+        try:
+            operation(value)
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    return {"latencies": latencies, "errors": errors}
+
+
+def summarize(result: dict) -> dict:
+    """Throughput, latency percentiles and process peak memory of a timed run"""
+    latencies = result["latencies"]
+    total = sum(latencies)
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "calls": len(latencies),
+        "errors": result["errors"],
+        "seconds": round(total, 6),
+        "per_second": round(len(latencies) / total, 1) if total else None,
+        "p50_us": round(percentiles[49] * 1e6, 1),
+        "p99_us": round(percentiles[98] * 1e6, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(scale: str, seed: int, workers: int) -> dict:
+    """
+    Run every benchmark of a scale on a fresh BankSystem
+    :param scale: Key of SCALES
+    :param seed
+    :param workers: Processes for the parallel month-end run
+    """
+    config = SCALES[scale]
+    rng = random.Random(seed)
+    bank_system = BankSystem()
+    bank_system.quiet = True
+    months = [datetime.combine(start, datetime.min.time()) for start in month_starts(config['months'])]
+    results = {}
+    rules = generate_rules(rng, config['rules'], config['months'])
+    results['define_interest_rule'] = summarize(timed(bank_system.define_interest_rule, rules))
+    transactions = generate_transactions(rng, config['accounts'], config['transactions'], config['months'])
+    results['handle_transaction'] = summarize(timed(bank_system.handle_transaction, transactions))
+    statements = generate_statements(rng, config['accounts'], config['statements'], config['months'])
+    results['handle_show_transaction_and_interest'] = summarize(
+        timed(bank_system.handle_show_transaction_and_interest, statements))
+    results['calculate_eom_interest'] = summarize(timed(bank_system.calculate_eom_interest, months))
+    results['run_month_end'] = summarize(
+        timed(lambda year_month: bank_system.run_month_end(year_month, workers=1), months))
+    if workers > 1:
+        results[f'run_month_end_{workers}_workers'] = summarize(
+            timed(lambda year_month: bank_system.run_month_end(year_month, workers=workers), months))
+        bank_system.close_eom_pool()
+    return {
+        "scale": scale, "seed": seed, "config": config, "commit": git_commit(),
+        "python": platform.python_version(), "created": datetime.now().isoformat(timespec='seconds'),
+        "results": results,
+    }
+
+
+def print_report(report: dict, baseline: dict = None) -> None:
+    print(f"{'Operation':<40}{'Calls':>9}{'Errors':>8}{'Ops/s':>12}{'p50 (us)':>11}{'p99 (us)':>11}"
+          f"{'Peak MB':>9}" + (f"{'vs base':>9}" if baseline else ''))
+    for operation, stats in report["results"].items():
+        line = (f"{operation:<40}{stats['calls']:>9}{stats['errors']:>8}{stats['per_second'] or 0:>12,.1f}"
+                f"{stats['p50_us']:>11.1f}{stats['p99_us']:>11.1f}{stats['peak_rss_mb']:>9.1f}")
+        base = (baseline or {}).get("results", {}).get(operation)
+        if base and base.get('per_second') and stats['per_second']:
+            line += f"{stats['per_second'] / base['per_second']:>8.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=EOM_WORKERS)
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare throughput against')
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)  # Time the operations, not the console
+    report = run_suite(args.scale, args.seed, args.workers)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
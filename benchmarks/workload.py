@@ -0,0 +1,80 @@
+"""
+Seeded synthetic workload: accounts, interest rule timelines and transaction streams with
+backdated rows and same-day withdrawal bursts.
+"""
+import random
+from datetime import date, timedelta
+
+SCALES = {
+    'small': {'accounts': 100, 'transactions': 10000, 'rules': 12, 'months': 12, 'statements': 200},
+    'medium': {'accounts': 1000, 'transactions': 100000, 'rules': 50, 'months': 12, 'statements': 1000},
+    'large': {'accounts': 10000, 'transactions': 1000000, 'rules': 200, 'months': 24, 'statements': 5000},
+}
+START = date(2024, 1, 1)
+
+
+def month_starts(months: int) -> list:
+    """First day of each month of the workload"""
+    return [date(START.year + (START.month - 1 + index) // 12, (START.month - 1 + index) % 12 + 1, 1)
+            for index in range(months)]
+
+
+def generate_rules(rng: random.Random, count: int, months: int) -> list:
+    """
+    Interest rule inputs spread over the workload period, some replacing an earlier rule's date
+    :param rng
+    :param count
+    :param months
+    """
+    days = (month_starts(months + 1)[-1] - START).days
+    rules = []
+    for index in range(count):
+        rule_date = START + timedelta(days=0 if index == 0 else rng.randrange(days))
+        rules.append(f"{rule_date.strftime('%Y%m%d')} RULE{index:04d} {rng.randint(50, 500) / 100:.2f}")
+    return rules
+
+
+def generate_transactions(rng: random.Random, accounts: int, count: int, months: int,
+                          backdated_ratio: float = 0.05, burst_ratio: float = 0.02):
+    """
+    Transaction inputs moving forward through the period. A share of rows is dated up to 60 days
+    in the past and some rows start a burst of withdrawals on one account and day around the limit.
+    :param rng
+    :param accounts
+    :param count
+    :param months
+    :param backdated_ratio
+    :param burst_ratio
+    """
+    days = (month_starts(months + 1)[-1] - START).days
+    names = [f"AC{index:06d}" for index in range(accounts)]
+    produced = 0
+    while produced < count:
+        today = START + timedelta(days=produced * days // count)
+        account = rng.choice(names)
+        if rng.random() < backdated_ratio:
+            today = max(START, today - timedelta(days=rng.randint(1, 60)))
+        if rng.random() < burst_ratio:
+            for _ in range(min(rng.randint(3, 8), count - produced)):
+                yield f"{today.strftime('%Y%m%d')} {account} w {rng.randint(200, 1200)}.00"
+                produced += 1
+            continue
+        txn_type = 'w' if rng.random() < 0.3 else 'd'
+        amount = rng.randint(1, 300000 if txn_type == 'd' else 50000) / 100
+        yield f"{today.strftime('%Y%m%d')} {account} {txn_type} {amount:.2f}"
+        produced += 1
+
+
+def generate_statements(rng: random.Random, accounts: int, count: int, months: int) -> list:
+    """
+    Distinct <Account> <Year><Month> statement inputs
+    :param rng
+    :param accounts
+    :param count
+    :param months
+    """
+    pairs = set()
+    starts = month_starts(months)
+    while len(pairs) < min(count, accounts * months):
+        pairs.add((f"AC{rng.randrange(accounts):06d}", rng.choice(starts).strftime('%Y%m')))
+    return [f"{account} {month}" for account, month in sorted(pairs)]
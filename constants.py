@@ -1 +1,20 @@
 W_TRANSACTION_LIMIT = 3000
+MAX_CENTS = 2 ** 63 - 1  # Largest amount and balance in cents the int64 ledger columns hold
+INGEST_CHUNK_SIZE = 10000
+INTEREST_METHODS = ('interval', 'daily')
+INTEREST_METHOD = 'interval'
+STATEMENT_CACHE_SIZE = 1024
+EOM_WORKERS = 1  # Worker processes only pay off for large books on hosts with several CPUs
+SNAPSHOT_INTERVAL = 100000
+JOURNAL_SYNC_EVERY = 1  # Records per fsync of the journal, 1 makes every record survive power loss
+STATS_ENABLED = False
+STATS_SAMPLE_SIZE = 10000
+SERVER_WORKERS = 8
+RATE_PLACES = 4
+RATE_SCALE = 10 ** RATE_PLACES
+EXPORT_CHUNK_SIZE = 1000  # Accounts rendered, and rows written, at a time
+EXPORT_BUFFER_SIZE = 1 << 20
+EXPORT_FORMATS = ('csv', 'jsonl')
+SQLITE_BATCH_SIZE = 10000
+SQLITE_POOL_SIZE = 4
+SQLITE_STATEMENT_CACHE = 128
@@ -0,0 +1,66 @@
+import functools
+import statistics
+from collections import defaultdict, deque
+from time import perf_counter
+
+from constants import STATS_ENABLED, STATS_SAMPLE_SIZE
+
+
+class Stats:
+    """
+    Call counts, cumulative time and a window of recent latencies per instrumented operation.
+    Timings of an operation include the operations it calls.
+    """
+
+    def __init__(self, enabled: bool = STATS_ENABLED, sample_size: int = STATS_SAMPLE_SIZE):
+        self.enabled = enabled
+        self.sample_size = sample_size
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything recorded so far"""
+        self.calls = defaultdict(int)
+        self.totals = defaultdict(float)
+        self.samples = defaultdict(lambda: deque(maxlen=self.sample_size))
+
+    def record(self, name: str, seconds: float) -> None:
+        self.calls[name] += 1
+        self.totals[name] += seconds
+        self.samples[name].append(seconds)
+
+    def summary(self) -> dict:
+        """Per operation calls, cumulative milliseconds and p50/p99 microseconds of recent calls"""
+        result = {}
+        for name in sorted(self.calls):
+            samples = list(self.samples[name])
+            percentiles = statistics.quantiles(samples, n=100) if len(samples) > 1 else samples * 99
+            result[name] = {
+                "calls": self.calls[name],
+                "total_ms": round(self.totals[name] * 1e3, 3),
+                "p50_us": round(percentiles[49] * 1e6, 1),
+                "p99_us": round(percentiles[98] * 1e6, 1),
+            }
+        return result
+
+
+stats = Stats()
+
+
+def instrumented(name: str):
+    """
+    Time every call of the decorated function under name while stats are enabled.
+    When disabled the only cost is one attribute check.
+    :param name: Operation name shown in the stats
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not stats.enabled:
+                return func(*args, **kwargs)
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.record(name, perf_counter() - started)
+        return wrapper
+    return decorator
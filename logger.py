@@ -1,4 +1,7 @@
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 # Create a logger
 logger = logging.getLogger("MyLogger")
@@ -19,6 +22,15 @@ formatter = logging.Formatter('%(message)s')
 file_handler.setFormatter(formatter)
 console_handler.setFormatter(formatter)
 
-# Add the handlers to the logger
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+# Hand records to a background thread that writes them to both handlers,
+# so callers only pay for putting the record on the queue
+log_queue = queue.Queue()
+listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+logger.addHandler(QueueHandler(log_queue))
+listener.start()
+atexit.register(listener.stop)
+
+
+def flush_logger() -> None:
+    """Block until every queued record has been written"""
+    log_queue.join()
@@ -1,13 +1,16 @@
-from logger import logger
+from logger import logger, flush_logger
 from operations import BankOperationsMixins
 from messages import *
 
 
 class BankSystem(BankOperationsMixins):
 
-    def __init__(self):
+    def __init__(self, data_dir: str = None, storage=None):
         super().__init__()
-        self.balance_by_day = {}
+        if storage:
+            self.open_storage(storage)
+        if data_dir:
+            self.open_journal(data_dir)
 
     def run_operations(self) -> None:
         """
@@ -16,6 +19,7 @@ class BankSystem(BankOperationsMixins):
         display_text = MAIN_OPERATIONS
         while True:
             try:
+                flush_logger()
                 choice = input(display_text).strip().lower()
                 if choice == "t":
                     transaction_items = input(INPUT_TXN)
@@ -27,8 +31,12 @@ class BankSystem(BankOperationsMixins):
                         self.define_interest_rule(interest_rule)
                 elif choice == "p":
                     account_no = input(INPUT_ACCOUNT)
-                    if account_no:
+                    if len(account_no.split()) == 3:
+                        self.handle_show_range_statement(account_no)
+                    elif account_no:
                         self.handle_show_transaction_and_interest(account_no)
+                elif choice == "s":
+                    self.handle_stats(input(INPUT_STATS))
                 elif choice == "q":
                     logger.info(INPUT_QUIT)
                     break
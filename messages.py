@@ -3,6 +3,7 @@ Welcome to AwesomeGIC Bank! What would you like to do?
 [T] Input transactions 
 [I] Define interest rules
 [P] Print statement
+[S] Show statistics
 [Q] Quit
 >   """
 MORE_OPERATIONS = """
@@ -10,6 +11,7 @@ Is there anything else you'd like to do?
 [T] Input transactions 
 [I] Define interest rules
 [P] Print statement
+[S] Show statistics
 [Q] Quit
 >   """
 INPUT_TXN = """
@@ -23,10 +25,16 @@ Please enter interest rules details in <Date> <RuleId> <Rate in %> format
 >"""
 
 INPUT_ACCOUNT = """
-Please enter account and month to generate the statement <Account> <Year><Month>
+Please enter account and month to generate the statement <Account> <Year><Month>,
+<Account> <From Year><Month> <To Year><Month> or <Account> YTD <Year><Month> for a monthly summary
 (or enter blank to go back to main menu):
 >"""
 
+INPUT_STATS = """
+Please enter on or off to switch timing of operations
+(or enter blank to show statistics):
+>"""
+
 INPUT_QUIT = """
 Thank you for banking with AwesomeGIC Bank.
 Have a nice day!"""
@@ -36,3 +44,12 @@ Have a nice day!"""
 TRANSACTION = '|{}|{}|{}|{}|'
 INTEREST = '|{}|{}|{}|'
 INTEREST_CAL = '|{}|{}|{}|{}|{}|'
+RANGE_STATEMENT = '|{}|{}|{}|{}|{}|{}|'
+
+REJECTED_ROW = 'Line {}: {}'
+INGEST_SUMMARY = 'Loaded {} rows, rejected {} rows.'
+STATS = '|{}|{}|{}|{}|{}|'
+STATS_OFF = 'Timing is off, enter on under [S] to time operations.'
+STATS_SWITCHED = 'Timing of operations is {}.'
+SERVER_LISTENING = 'Listening on {}'
+EXPORT_SUMMARY = 'Exported {} statement rows to {}.'
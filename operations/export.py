@@ -0,0 +1,111 @@
+import csv
+import json
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from fnmatch import fnmatch
+from typing import Iterator
+
+from logger import logger
+from messages import EXPORT_SUMMARY
+from utils import from_cents
+from instrumentation import instrumented
+from constants import EXPORT_CHUNK_SIZE, EXPORT_BUFFER_SIZE, EXPORT_FORMATS
+from operations.ingestion import chunked
+from operations.interest_engine import RateTimeline, ledger_month_interest, month_bounds
+
+EXPORT_FIELDS = ('account', 'date', 'txn_id', 'type', 'amount', 'balance')
+
+
+def statement_rows(year_month: datetime, timeline: RateTimeline, ledgers: list) -> list:
+    """
+    Statement rows of a batch of accounts, the month's transactions followed by the interest row.
+    Runs inside a worker process when exporting in parallel.
+    :param year_month
+    :param timeline: Interest rules of the book
+    :param ledgers: (account, ledger window of the month) pairs
+    """
+    rows = []
+    _, end = month_bounds(year_month)
+    month_end = datetime.fromordinal(end - 1).strftime('%Y%m%d')
+    for account, ledger in ledgers:
+        for txn in ledger.month_rows(year_month.year, year_month.month):
+            rows.append((account, txn['date'].strftime('%Y%m%d'), txn['id'], txn['type'], txn['amount'],
+                         txn['current_balance']))
+        interest = ledger_month_interest(ledger, timeline, year_month)
+        if interest:
+            rows.append((account, month_end, '', 'I', from_cents(interest),
+                         from_cents(ledger.balance_before(end) + interest)))
+    return rows
+
+
+class Export:
+
+    def iter_statement_rows(self, year_month: datetime, account_filter: str = None, workers: int = 1,
+                            chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[tuple]:
+        """
+        Lazily yield the month's statement rows of every account, in account order.
+        Accounts are rendered chunk_size at a time, with at most two chunks per worker in flight.
+        :param year_month
+        :param account_filter: Shell style pattern of accounts to export, e.g. AC0*, all when omitted
+        :param workers: Number of processes, 1 renders in this process
+        :param chunk_size: Number of accounts rendered at a time
+        """
+        if workers < 1:
+            raise Exception('Number of workers must be at least 1.')
+        start, end = month_bounds(year_month)
+        accounts = sorted(account for account in self.accounts
+                          if not account_filter or fnmatch(account, account_filter))
+        batches = ([(account, self.accounts[account]['transactions'].window(start, end))
+                    for account in accounts[index:index + chunk_size]]
+                   for index in range(0, len(accounts), chunk_size))
+        if workers == 1:
+            for batch in batches:
+                yield from statement_rows(year_month, self.rate_timeline, batch)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for batch in batches:
+                pending.append(pool.submit(statement_rows, year_month, self.rate_timeline, batch))
+                if len(pending) >= workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    @instrumented('export_statements')
+    def export_statements(self, year_month: datetime, path: str, export_format: str = 'csv',
+                          account_filter: str = None, workers: int = 1) -> int:
+        """
+        Stream the month's statement of every account to a CSV or JSON Lines file
+        :param year_month
+        :param path: Output file, "-" for stdout
+        :param export_format: csv or jsonl
+        :param account_filter: Shell style pattern of accounts to export, all when omitted
+        :param workers: Number of processes rendering statements
+        :return: Number of rows written
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise Exception(f'Export format must be one of {", ".join(EXPORT_FORMATS)}.')
+        rows = self.iter_statement_rows(year_month, account_filter, workers)
+        handle = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8',
+                                                      buffering=EXPORT_BUFFER_SIZE)
+        count = 0
+        try:
+            if export_format == 'csv':
+                writer = csv.writer(handle)
+                writer.writerow(EXPORT_FIELDS)
+                for chunk in chunked(rows, EXPORT_CHUNK_SIZE):
+                    writer.writerows(chunk)
+                    count += len(chunk)
+            else:
+                for chunk in chunked(rows, EXPORT_CHUNK_SIZE):
+                    handle.write(''.join(json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n' for row in chunk))
+                    count += len(chunk)
+        finally:
+            if handle is sys.stdout:
+                handle.flush()
+            else:
+                handle.close()
+        logger.info(EXPORT_SUMMARY.format(count, path))
+        return count
@@ -0,0 +1,91 @@
+import sys
+from itertools import islice
+from typing import Iterable, Iterator
+
+from logger import logger
+from messages import REJECTED_ROW, INGEST_SUMMARY
+from constants import INGEST_CHUNK_SIZE
+
+
+def read_rows(source) -> Iterator[tuple]:
+    """
+    Lazily yield (line number, row) pairs from a file path, "-" for stdin, or any iterable of lines.
+    Blank lines, "#" comments and a leading "Date,..." header are skipped, commas are treated as separators.
+    :param source
+    """
+    if isinstance(source, str):
+        handle = sys.stdin if source == '-' else open(source, encoding='utf-8')
+        try:
+            yield from read_rows(iter(handle))
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+        return
+    for line_no, line in enumerate(source, start=1):
+        row = line.replace(',', ' ').strip()
+        if not row or row.startswith('#'):
+            continue
+        if line_no == 1 and row.lower().startswith('date'):
+            continue
+        yield line_no, row
+
+
+def chunked(rows: Iterable, chunk_size: int) -> Iterator[list]:
+    """
+    Group rows into lists of at most chunk_size items
+    :param rows
+    :param chunk_size
+    """
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+
+class Ingestion:
+
+    def ingest_transactions(self, source, chunk_size: int = INGEST_CHUNK_SIZE) -> dict:
+        """
+        Bulk load <Date> <Account> <Type> <Amount> rows without echoing account statements.
+        :param source: File path, "-" for stdin or an iterable of lines
+        :param chunk_size: Number of rows parsed at a time
+        :return: Count of accepted and rejected rows
+        """
+        return self._ingest(source, chunk_size, self.parse_transaction, lambda values: self.apply_transaction(*values))
+
+    def ingest_interest_rules(self, source, chunk_size: int = INGEST_CHUNK_SIZE) -> dict:
+        """
+        Bulk load <Date> <RuleId> <Rate in %> rows without echoing the rules table.
+        :param source: File path, "-" for stdin or an iterable of lines
+        :param chunk_size: Number of rows parsed at a time
+        :return: Count of accepted and rejected rows
+        """
+        return self._ingest(source, chunk_size, self.validate_new_interest_rule,
+                            lambda values: self.add_interest_rule(*values))
+
+    @staticmethod
+    def _ingest(source, chunk_size: int, parse, apply) -> dict:
+        """
+        Run rows through parse and apply chunk by chunk, logging rejected rows with their line number
+        :param source
+        :param chunk_size
+        :param parse: Callable turning a row into values, raising on invalid rows
+        :param apply: Callable validating values against current state and storing them
+        """
+        accepted = rejected = 0
+        for chunk in chunked(read_rows(source), chunk_size):
+            parsed = []
+            for line_no, row in chunk:
+                try:
+                    parsed.append((line_no, parse(row)))
+                except Exception as err:
+                    rejected += 1
+                    logger.error(REJECTED_ROW.format(line_no, err))
+            for line_no, values in parsed:
+                try:
+                    apply(values)
+                    accepted += 1
+                except Exception as err:
+                    rejected += 1
+                    logger.error(REJECTED_ROW.format(line_no, err))
+        logger.info(INGEST_SUMMARY.format(accepted, rejected))
+        return {"accepted": accepted, "rejected": rejected}
@@ -1,16 +1,22 @@
-import calendar
+import bisect
 from datetime import datetime
-import copy
 
 from logger import logger
 from messages import INTEREST, INTEREST_CAL
-from utils import validate_time_format
+from utils import validate_time_format, to_minor_units, from_cents
+from instrumentation import instrumented
+from constants import INTEREST_METHOD, INTEREST_METHODS, STATEMENT_CACHE_SIZE, RATE_PLACES, RATE_SCALE
+from operations.statement_cache import StatementCache
+from operations.interest_engine import RateTimeline, month_bounds, round_interest
 
 class Interest:
 
     def __init__(self):
         self.interest_rules = []
         self.accounts = {}
+        self.interest_method = INTEREST_METHOD
+        self.statement_cache = StatementCache(STATEMENT_CACHE_SIZE)
+        self.rate_timeline = RateTimeline(self.interest_rules)
 
     def validate_new_interest_rule(self, interest_rule):
         """
@@ -23,38 +29,77 @@ class Interest:
             raise Exception('Interest values are not in correct format.')
         date, rule_id, rate = interest_rule
         date = validate_time_format(date)
+        to_minor_units(rate, RATE_PLACES, f'Interest rate must be at most {RATE_PLACES} decimal places.')
         rate = float(rate)
         if rate <= 0 or rate >= 100:
             raise Exception("Interest rate must be greater than 0 and less than 100.")
         return date, rate, rule_id
 
+    @instrumented('define_interest_rule')
     def define_interest_rule(self, interest_rule: str):
         """
         Adds or updates an interest rule.
         :param interest_rule Input interest rule
         """
         date, rate, rule_id = self.validate_new_interest_rule(interest_rule)
-        self.interest_rules = [rule for rule in self.interest_rules if rule["date"] != date]
-        self.interest_rules.append({"date": date, "rule_id": rule_id, "rate": rate})
-        self.interest_rules.sort(key=lambda x: x["date"])
+        self.add_interest_rule(date, rate, rule_id)
         self.print_interest_rules()
 
+    @instrumented('add_interest_rule')
+    def add_interest_rule(self, date: datetime, rate: float, rule_id: str) -> None:
+        """
+        Insert a validated rule keeping rules sorted by date, replacing any rule of the same date.
+        :param date
+        :param rate
+        :param rule_id
+        """
+        with self.book_lock:
+            self.insert_interest_rule(self.interest_rules, date, rate, rule_id)
+            self.rate_timeline = RateTimeline(self.interest_rules)
+            for details in self.accounts.values():
+                details["accrual"].reaccrue(date.toordinal(), details["transactions"], self.rate_timeline)
+            self.statement_cache.invalidate_months((date.year, date.month))
+            self.journal_interest_rule(date, rate, rule_id)
+
+    @staticmethod
+    def insert_interest_rule(interest_rules: list, date: datetime, rate: float, rule_id: str) -> None:
+        """
+        Insert a rule into a date sorted list of rules, replacing any rule of the same date
+        :param interest_rules
+        :param date
+        :param rate
+        :param rule_id
+        """
+        rule = {"date": date, "rule_id": rule_id, "rate": rate, "rate_units": round(rate * RATE_SCALE)}
+        index = bisect.bisect_left(interest_rules, date, key=lambda x: x["date"])
+        if index < len(interest_rules) and interest_rules[index]["date"] == date:
+            interest_rules[index] = rule
+        else:
+            interest_rules.insert(index, rule)
+
+    @instrumented('print_interest_rules')
     def print_interest_rules(self) -> None:
         """Console log interest rules"""
+        logger.info('\n'.join(self.format_interest_rules()))
+
+    def format_interest_rules(self) -> list:
+        """Format interest rules as table lines"""
         find_space = lambda value: 20 - len(str(value))
-        logger.info(INTEREST.format(
+        lines = [INTEREST.format(
             'Date' + ' ' * find_space('Date'),
             'RuleId' + ' ' * find_space('RuleId'),
             'Rate (%)' + ' ' * find_space('Rate (%)'),
-        ))
+        )]
         for rule in self.interest_rules:
             date, rule_id, rate = str(rule['date']), str(rule['rule_id']), str(rule['rate'])
-            logger.info(INTEREST.format(
+            lines.append(INTEREST.format(
                 date + ' ' * find_space(date),
                 rule_id + ' ' * find_space(rule_id),
                 rate + ' ' * find_space(rate)
             ))
+        return lines
 
+    @instrumented('filter_current_month_transactions')
     def filter_current_month_transactions(self, year_month: datetime, account: str):
         """
         Return all transactions of provided month
@@ -62,39 +107,63 @@ class Interest:
         :param account:
         :return:
         """
-        transaction_balances = []
-        for index, txn in enumerate(self.accounts[account]['transactions'], start=1):
-            if txn["date"].year > year_month.year:
-                break
-            if txn["date"].year == year_month.year and txn["date"].month == year_month.month:
-                transaction_balances.append(copy.deepcopy(txn))
-        return transaction_balances
+        return self.accounts[account]['transactions'].month_rows(year_month.year, year_month.month)
+
+    @instrumented('calculate_monthly_interest')
+    def calculate_monthly_interest(self, year_month: datetime, account: str = None) -> float:
+        """
+        Calculate interest of the provided month with the selected interest method
+        :param year_month:
+        :param account:
+        :return:
+        """
+        return from_cents(self.get_statement_entry(year_month, account)["interest"])
+
+    def get_statement_entry(self, year_month: datetime, account: str) -> dict:
+        """
+        Interest in cents of an account's month and its statement lines once rendered,
+        memoized in the statement cache for the interval method
+        :param year_month:
+        :param account:
+        :return:
+        """
+        if self.interest_method not in INTEREST_METHODS:
+            raise Exception(f'Interest method must be one of {", ".join(INTEREST_METHODS)}.')
+        if self.interest_method == 'daily':
+            return {"interest": round(self.calculate_daily_interest(year_month, account) * 100), "lines": None}
+        month = (year_month.year, year_month.month)
+        entry = self.statement_cache.get(account, month)
+        if entry is None:
+            entry = {"interest": self.calculate_interval_interest(year_month, account), "lines": None}
+            self.statement_cache.put(account, month, entry)
+        return entry
+
+    @instrumented('calculate_interval_interest')
+    def calculate_interval_interest(self, year_month: datetime, account: str) -> int:
+        """
+        Calculate interest in cents of the provided month from the account's running accrual
+        :param year_month:
+        :param account:
+        :return:
+        """
+        return round_interest(self.accounts[account]['accrual'].month_total(year_month, self.rate_timeline))
 
-    def calculate_monthly_interest(self, year_month):
+    @instrumented('calculate_daily_interest')
+    def calculate_daily_interest(self, year_month: datetime, account: str) -> float:
         """
-        Calculate interest of the provided month
+        Calculate interest of the provided month day by day
         :param year_month:
+        :param account:
         :return:
         """
         interest = 0.00
-        last_date_txn_balance = {}  # This is to store days of the month with no transactions
-        for daily_balance_date, balance in self.balance_by_day.items():
-            filtered_rule = None
-            # Gather interest rules that apply to each transaction and calculate interest
-            if daily_balance_date.year == year_month.year and daily_balance_date.month == year_month.month:
-                for rule in self.interest_rules:
-                    if rule['date'].date() <= daily_balance_date:  # Get the most recent interest rule in the past
-                        filtered_rule = rule
-                        last_date_txn_balance.update(rule=filtered_rule, balance=balance, date=daily_balance_date)
-            if filtered_rule:
-                interest += balance * (filtered_rule['rate'] / 100 )
-        # Calculate interest for days of no transactions
-        if last_date_txn_balance.get('date') and last_date_txn_balance.get('rule'):
-            last_month_day = calendar.monthrange(year_month.year, year_month.month)[1]
-            remaining_days = (last_date_txn_balance['date'].replace(day=last_month_day) - last_date_txn_balance['date']).days
-            if remaining_days > 0:
-                for _ in range(remaining_days):
-                    interest += last_date_txn_balance['balance'] * (last_date_txn_balance['rule']['rate'] / 100)
+        start, end = month_bounds(year_month)
+        rule_starts = [rule['date'].toordinal() for rule in self.interest_rules]
+        for seg_start, seg_end, balance in self.accounts[account]['transactions'].balance_segments(start, end):
+            for day in range(seg_start, seg_end):
+                index = bisect.bisect_right(rule_starts, day) - 1  # Get the most recent interest rule in the past
+                if index >= 0:
+                    interest += from_cents(balance) * (self.interest_rules[index]['rate'] / 100)
         interest = round(interest/365, 2) if interest else interest
         return interest
 
@@ -113,22 +182,45 @@ class Interest:
             raise Exception('Provided account or its does not exist.')
         return account, year_month
 
+    @instrumented('handle_show_transaction_and_interest')
     def handle_show_transaction_and_interest(self, acount_date: str) -> float:
         """
         Show all transactions along with interest of the month.
         :param acount_date: Input account number in string
         """
+        interest, lines = self.get_statement(acount_date)
+        logger.info('\n'.join(lines))
+        return interest
+
+    def get_statement(self, acount_date: str) -> tuple:
+        """
+        Interest of the month and the statement table lines, without printing them
+        :param acount_date: Input account number in string
+        """
         account, year_month = self.validate_input_acount_date(acount_date)
-        self.accounts[account]['transactions'].sort(key=lambda x: x['date'])
-        transaction_balances = self.filter_current_month_transactions(year_month, account)
-        interest = self.calculate_monthly_interest(year_month)
+        entry = self.get_statement_entry(year_month, account)
+        if entry["lines"] is None:
+            entry["lines"] = self.build_statement_lines(self.accounts[account]['transactions'], year_month,
+                                                        entry["interest"])
+        return from_cents(entry["interest"]), entry["lines"]
+
+    @staticmethod
+    @instrumented('build_statement_lines')
+    def build_statement_lines(ledger, year_month: datetime, interest: int) -> list:
+        """
+        Statement table lines of the month's transactions followed by the interest row
+        :param ledger: Ledger of the account
+        :param year_month
+        :param interest: In cents
+        """
+        transaction_balances = ledger.month_rows(year_month.year, year_month.month)
         if interest:
+            _, end = month_bounds(year_month)
             transaction_balances.append({
-                "date": datetime.now(), "id": '', "type": 'I', "amount": interest,
-                "current_balance": self.accounts[account]['balance'] + interest
+                "date": datetime.fromordinal(end - 1), "id": '', "type": 'I', "amount": from_cents(interest),
+                "current_balance": from_cents(ledger.balance_before(end) + interest)
             })
-        self.print_eom_interest_results(transaction_balances)
-        return interest
+        return Interest.format_eom_interest_results(transaction_balances)
 
     @staticmethod
     def print_eom_interest_results(transaction_balances: list) -> None:
@@ -136,21 +228,30 @@ class Interest:
         Console log all transactions
         :param transaction_balances: All transactions of an account
         """
+        logger.info('\n'.join(Interest.format_eom_interest_results(transaction_balances)))
+
+    @staticmethod
+    def format_eom_interest_results(transaction_balances: list) -> list:
+        """
+        Format all transactions as statement table lines
+        :param transaction_balances: All transactions of an account
+        """
         find_space = lambda value: 20 - len(str(value))
-        logger.info(INTEREST_CAL.format(
+        lines = [INTEREST_CAL.format(
             'Date' + ' ' * find_space('Date'),
             'Txn Id' + ' ' * find_space('Txn Id'),
             'Type' + ' ' * find_space('Type'),
             'Amount' + ' ' * find_space('Amount'),
             'Balance' + ' ' * find_space('Balance'),
-        ))
+        )]
         for txn in transaction_balances:
             date, txn_id, txn_type, amount = txn['date'], str(txn['id']), str(txn['type']), str(txn['amount'])
             date = date.strftime("%Y%m%d")
-            logger.info(INTEREST_CAL.format(
+            lines.append(INTEREST_CAL.format(
                 date + ' ' * find_space(date),
                 txn_id + ' ' * find_space(txn_id),
                 txn_type + ' ' * find_space(txn_type),
                 amount + ' ' * find_space(amount),
                 str(txn['current_balance']) + ' ' * find_space(str(txn['current_balance']))
             ))
+        return lines
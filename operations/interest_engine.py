@@ -0,0 +1,179 @@
+import bisect
+import calendar
+from datetime import date, datetime
+
+from constants import RATE_SCALE
+
+# Balance in cents x rate in 1/RATE_SCALE % x days, divided by this, is the interest in cents
+INTEREST_DIVISOR = 100 * RATE_SCALE * 365
+
+
+def month_bounds(year_month: datetime) -> tuple:
+    """
+    First day and the day after the last day of a month as ordinals, i.e. the half open range [start, end)
+    :param year_month
+    """
+    last_month_day = calendar.monthrange(year_month.year, year_month.month)[1]
+    start = date(year_month.year, year_month.month, 1).toordinal()
+    return start, start + last_month_day
+
+
+def round_interest(interest: int) -> int:
+    """
+    Convert an exact sum of balance x rate x days into the posted interest in cents, rounding half to even
+    :param interest: Sum in cents x 1/RATE_SCALE % x days
+    """
+    cents, remainder = divmod(interest, INTEREST_DIVISOR)
+    if remainder * 2 > INTEREST_DIVISOR or (remainder * 2 == INTEREST_DIVISOR and cents % 2):
+        cents += 1
+    return cents
+
+
+class RateTimeline:
+    """
+    Interest rules as a piecewise constant rate, rule i applying from its date until the next rule's date
+    """
+
+    def __init__(self, interest_rules: list):
+        self.starts = [rule['date'].toordinal() for rule in interest_rules]
+        self.rates = [rule['rate_units'] for rule in interest_rules]
+
+    def rate_on(self, day: int):
+        """
+        Rate in 1/RATE_SCALE % applying on a day, None before the first rule
+        :param day: Day ordinal
+        """
+        index = bisect.bisect_right(self.starts, day) - 1
+        return self.rates[index] if index >= 0 else None
+
+    def segments(self, start: int, end: int):
+        """
+        Yield (start, end, rate) for every rule interval overlapping [start, end)
+        :param start: Day ordinal
+        :param end: Day ordinal, exclusive
+        """
+        index = max(bisect.bisect_right(self.starts, start) - 1, 0)
+        while index < len(self.starts) and self.starts[index] < end:
+            next_start = self.starts[index + 1] if index + 1 < len(self.starts) else end
+            seg_start, seg_end = max(start, self.starts[index]), min(end, next_start)
+            if seg_start < seg_end:
+                yield seg_start, seg_end, self.rates[index]
+            index += 1
+
+
+def interval_interest(points: list, timeline: RateTimeline, start: int, end: int) -> int:
+    """
+    Exact sum of balance x rate x days over [start, end), merging balance change points with rule intervals
+    :param points: Sorted (day ordinal, balance in cents) change points of an account
+    :param timeline
+    :param start: Day ordinal
+    :param end: Day ordinal, exclusive
+    """
+    interest = 0
+    index = bisect.bisect_right(points, start, key=lambda x: x[0]) - 1
+    balance = points[index][1] if index >= 0 else 0
+    seg_start = start
+    index += 1
+    while seg_start < end:
+        seg_end = min(points[index][0], end) if index < len(points) else end
+        if balance:
+            for rule_start, rule_end, rate in timeline.segments(seg_start, seg_end):
+                interest += balance * rate * (rule_end - rule_start)
+        if index < len(points):
+            balance = points[index][1]
+        seg_start = seg_end
+        index += 1
+    return interest
+
+
+def ledger_month_interest(ledger, timeline: RateTimeline, year_month: datetime) -> int:
+    """
+    Posted interest in cents of one account's month
+    :param ledger: Ledger of the account
+    :param timeline
+    :param year_month
+    """
+    start, end = month_bounds(year_month)
+    return round_interest(interval_interest(ledger.balance_points(start, end), timeline, start, end))
+
+
+class InterestAccrual:
+    """
+    Running exact interest (balance x rate x days) of one account by month, accrued up to day.
+    A posting on or after day first accrues the balance held since day, a backdated posting
+    adds its own amount x rate x days to the months already accrued.
+    """
+    __slots__ = ('day', 'balance', 'months')
+
+    def __init__(self):
+        self.day = None
+        self.balance = 0
+        self.months = {}
+
+    def accrue(self, balance: int, start: int, end: int, timeline: RateTimeline) -> None:
+        """
+        Add balance x rate x days over [start, end) to the months it spans
+        :param balance: In cents
+        :param start: Day ordinal
+        :param end: Day ordinal, exclusive
+        :param timeline
+        """
+        if not balance:
+            return
+        for seg_start, seg_end, rate in timeline.segments(start, end):
+            while seg_start < seg_end:
+                day = date.fromordinal(seg_start)
+                seg_stop = min(seg_end, month_bounds(day)[1])
+                month = (day.year, day.month)
+                self.months[month] = self.months.get(month, 0) + balance * rate * (seg_stop - seg_start)
+                seg_start = seg_stop
+
+    def post(self, day: int, amount: int, timeline: RateTimeline) -> None:
+        """
+        Move the balance by amount from day on
+        :param day: Day ordinal
+        :param amount: In cents, negative for withdrawals
+        :param timeline
+        """
+        if self.day is None:
+            self.day = day
+        elif day > self.day:
+            self.accrue(self.balance, self.day, day, timeline)
+            self.day = day
+        else:
+            self.accrue(amount, day, self.day, timeline)
+        self.balance += amount
+
+    def reaccrue(self, start: int, ledger, timeline: RateTimeline) -> None:
+        """
+        Accrue again every month from the month of start, after the rates from start on changed
+        :param start: Day ordinal
+        :param ledger: Ledger of the account
+        :param timeline
+        """
+        if self.day is None or start >= self.day:
+            return
+        first = date.fromordinal(start)
+        month_start = date(first.year, first.month, 1).toordinal()
+        for month in [month for month in self.months if month >= (first.year, first.month)]:
+            del self.months[month]
+        previous_day, balance = month_start, 0
+        for day, point_balance in ledger.balance_points(month_start, self.day):
+            if day > previous_day:
+                self.accrue(balance, previous_day, day, timeline)
+                previous_day = day
+            balance = point_balance
+        self.accrue(balance, previous_day, self.day, timeline)
+
+    def month_total(self, year_month: datetime, timeline: RateTimeline) -> int:
+        """
+        Exact sum of balance x rate x days of a month, without walking the ledger
+        :param year_month
+        :param timeline
+        """
+        start, end = month_bounds(year_month)
+        total = self.months.get((year_month.year, year_month.month), 0)
+        if self.day is not None and end > self.day and self.balance:
+            for seg_start, seg_end, rate in timeline.segments(max(start, self.day), end):
+                total += self.balance * rate * (seg_end - seg_start)
+        return total
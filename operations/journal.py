@@ -0,0 +1,368 @@
+import mmap
+import os
+import struct
+import threading
+from array import array
+from datetime import date, datetime
+
+from constants import SNAPSHOT_INTERVAL, JOURNAL_SYNC_EVERY
+from operations.ledger import Ledger, TYPE_CODES, TYPES
+from operations.interest_engine import RateTimeline, InterestAccrual
+from utils import from_cents
+
+JOURNAL_FILE = 'journal.bin'
+SNAPSHOT_PREFIX = 'snapshot-'
+SNAPSHOT_MAGIC = b'BANKSNP5'
+
+# Journal records: a kind byte followed by a fixed part and, for T and R, a length prefixed name
+TXN_RECORD = struct.Struct('<ciiqbH')  # T, day ordinal, sequence number, amount in cents, type code, account length
+RULE_RECORD = struct.Struct('<cidH')  # R, day ordinal, rate, rule id length
+POSTED_RECORD = struct.Struct('<cii')  # P, year, month
+LENGTH = struct.Struct('<Q')
+FLOAT = struct.Struct('<d')
+ACCRUAL_SHIFT = 62  # Exact month accruals can pass int64, they are stored as two int64 halves
+ACCRUAL_MASK = (1 << ACCRUAL_SHIFT) - 1
+
+
+class SnapshotReader:
+    """
+    Sequential reader over a memory-mapped snapshot
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.offset = len(SNAPSHOT_MAGIC)
+
+    def read_bytes(self) -> memoryview:
+        (length,) = LENGTH.unpack_from(self.buffer, self.offset)
+        self.offset += LENGTH.size + length
+        return self.buffer[self.offset - length:self.offset]
+
+    def read_str(self) -> str:
+        return str(self.read_bytes(), 'utf-8')
+
+    def read_int(self) -> int:
+        (value,) = LENGTH.unpack_from(self.buffer, self.offset)
+        self.offset += LENGTH.size
+        return value
+
+    def read_float(self) -> float:
+        (value,) = FLOAT.unpack_from(self.buffer, self.offset)
+        self.offset += FLOAT.size
+        return value
+
+    def read_array(self) -> array:
+        typecode = self.read_str()
+        values = array(typecode)
+        values.frombytes(self.read_bytes())
+        return values
+
+
+class SnapshotWriter:
+    """
+    Length prefixed writer producing what SnapshotReader reads
+    """
+
+    def __init__(self, handle):
+        self.handle = handle
+        handle.write(SNAPSHOT_MAGIC)
+
+    def write_bytes(self, value: bytes) -> None:
+        self.handle.write(LENGTH.pack(len(value)))
+        self.handle.write(value)
+
+    def write_str(self, value: str) -> None:
+        self.write_bytes(value.encode('utf-8'))
+
+    def write_int(self, value: int) -> None:
+        self.handle.write(LENGTH.pack(value))
+
+    def write_float(self, value: float) -> None:
+        self.handle.write(FLOAT.pack(value))
+
+    def write_array(self, values: array) -> None:
+        self.write_str(values.typecode)
+        self.write_bytes(values.tobytes())
+
+
+class Journal:
+    """
+    Durable state: every accepted transaction, rule change and interest posting is appended to
+    a binary journal, and the whole book is periodically written to a compact snapshot.
+    Recovery loads the latest snapshot and replays only the journal records written after it.
+    The journal is fsynced every journal_sync_every records, so with more than 1 up to that many
+    records minus one can be lost on power loss, though never on a crash of the process alone.
+    """
+
+    def __init__(self):
+        self.journal = None
+        self.data_dir = None
+        self.records_since_snapshot = 0
+        self.records_since_sync = 0
+        self.journal_sync_every = JOURNAL_SYNC_EVERY
+        self.snapshot_interval = SNAPSHOT_INTERVAL
+        self.snapshot_thread = None
+
+    def open_journal(self, data_dir: str) -> None:
+        """
+        Recover state from data_dir and journal every change from now on
+        :param data_dir: Directory holding the journal and snapshots
+        """
+        os.makedirs(data_dir, exist_ok=True)
+        end = self.recover_journal(data_dir)
+        self.data_dir = data_dir
+        self.journal = open(os.path.join(data_dir, JOURNAL_FILE), 'ab')
+        self.journal.truncate(end)  # Drop a record torn by a crash while it was being written
+        self.journal.seek(0, os.SEEK_END)
+
+    def recover_journal(self, data_dir: str) -> int:
+        """
+        Load the state of data_dir without journaling changes made afterwards, e.g. to read it
+        :param data_dir: Directory holding the journal and snapshots
+        :return: Journal size up to the last complete record
+        """
+        if self.storage.name != 'memory':
+            raise Exception('Journal and snapshots need the memory storage, SQLite storage is durable itself.')
+        if not os.path.isdir(data_dir):
+            raise Exception('Data directory does not exist.')
+        self.data_dir = data_dir
+        try:
+            return self.replay_journal(os.path.join(data_dir, JOURNAL_FILE), self.load_latest_snapshot())
+        finally:
+            self.data_dir = None
+
+    def close_journal(self) -> None:
+        """Wait for a running snapshot, then sync and close the journal"""
+        if self.snapshot_thread:
+            self.snapshot_thread.join()
+            self.snapshot_thread = None
+        if self.journal:
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+            self.journal.close()
+            self.journal = None
+
+    def append_record(self, record: bytes) -> None:
+        """
+        Append a record, syncing it to disk per the journal_sync_every policy. Every snapshot_interval
+        records a snapshot is started on a background thread, which waits for book_lock, so the
+        operation that crossed the interval does not pay for it. Writers arriving while the snapshot
+        runs still wait for it.
+        :param record
+        """
+        self.journal.write(record)
+        self.journal.flush()
+        self.records_since_sync += 1
+        if self.records_since_sync >= self.journal_sync_every:
+            os.fsync(self.journal.fileno())
+            self.records_since_sync = 0
+        self.records_since_snapshot += 1
+        if self.records_since_snapshot >= self.snapshot_interval and not (
+                self.snapshot_thread and self.snapshot_thread.is_alive()):
+            self.snapshot_thread = threading.Thread(target=self.background_snapshot, daemon=True)
+            self.snapshot_thread.start()
+
+    def background_snapshot(self) -> None:
+        with self.book_lock:
+            if self.journal and self.records_since_snapshot >= self.snapshot_interval:
+                self.snapshot()
+
+    def journal_transaction(self, txn_date: datetime, account: str, txn_type: str, amount: int) -> None:
+        """
+        Journal an accepted transaction
+        :param txn_date
+        :param account
+        :param txn_type
+        :param amount: In cents
+        """
+        if not self.journal:
+            return
+        name = account.encode('utf-8')
+        self.append_record(TXN_RECORD.pack(b'T', txn_date.toordinal(), self.txn_no_id[txn_date],
+                                           amount, TYPE_CODES[txn_type.upper()], len(name)) + name)
+
+    def journal_interest_rule(self, date: datetime, rate: float, rule_id: str) -> None:
+        """
+        Journal an added or replaced interest rule
+        :param date
+        :param rate
+        :param rule_id
+        """
+        if not self.journal:
+            return
+        name = rule_id.encode('utf-8')
+        self.append_record(RULE_RECORD.pack(b'R', date.toordinal(), rate, len(name)) + name)
+
+    def journal_posted_month(self, month: tuple) -> None:
+        """
+        Journal that interest of a month was posted
+        :param month: (year, month)
+        """
+        if not self.journal:
+            return
+        self.append_record(POSTED_RECORD.pack(b'P', *month))
+
+    def replay_journal(self, journal_path: str, offset: int) -> int:
+        """
+        Apply journal records written after offset, without validating or journaling them again
+        :param journal_path
+        :param offset: Journal size covered by the loaded snapshot
+        :return: Journal size up to the last complete record
+        """
+        if not os.path.exists(journal_path) or os.path.getsize(journal_path) <= offset:
+            return offset
+        with open(journal_path, 'rb') as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            while offset < len(buffer):
+                kind = buffer[offset:offset + 1]
+                if kind == b'T':
+                    if offset + TXN_RECORD.size > len(buffer):
+                        break
+                    _, day, seq, cents, code, length = TXN_RECORD.unpack_from(buffer, offset)
+                    end = offset + TXN_RECORD.size + length
+                    if end > len(buffer):
+                        break
+                    account = str(buffer[offset + TXN_RECORD.size:end], 'utf-8')
+                    txn_date = datetime.fromordinal(day)
+                    self.open_account(account)
+                    self.txn_no_id[txn_date] = seq
+                    self.add_transaction(txn_date, account, TYPES[code].lower(), cents)
+                elif kind == b'R':
+                    if offset + RULE_RECORD.size > len(buffer):
+                        break
+                    _, day, rate, length = RULE_RECORD.unpack_from(buffer, offset)
+                    end = offset + RULE_RECORD.size + length
+                    if end > len(buffer):
+                        break
+                    self.add_interest_rule(datetime.fromordinal(day), rate,
+                                           str(buffer[offset + RULE_RECORD.size:end], 'utf-8'))
+                elif kind == b'P':
+                    end = offset + POSTED_RECORD.size
+                    if end > len(buffer):
+                        break
+                    _, year, month = POSTED_RECORD.unpack_from(buffer, offset)
+                    self.posted_months.add((year, month))
+                else:
+                    raise Exception(f'Journal is corrupted at byte {offset}.')
+                offset = end
+                self.records_since_snapshot += 1
+        return offset
+
+    def snapshot(self) -> str:
+        """
+        Write the whole book to a new snapshot covering the journal so far and remove older snapshots
+        :return: Path of the snapshot
+        """
+        if not self.data_dir:
+            raise Exception('No data directory is open.')
+        with self.book_lock:  # Every change to the accounts and rules holds it, so the book is consistent
+            offset = self.journal.tell() if self.journal else 0
+            path = os.path.join(self.data_dir, f'{SNAPSHOT_PREFIX}{offset:020d}.bin')
+            try:
+                with open(path + '.tmp', 'wb') as handle:
+                    self.write_snapshot(handle, offset)
+            except BaseException:
+                os.remove(path + '.tmp')
+                raise
+            os.replace(path + '.tmp', path)
+            for name in os.listdir(self.data_dir):
+                if name.startswith(SNAPSHOT_PREFIX) and name != os.path.basename(path):
+                    os.remove(os.path.join(self.data_dir, name))
+            self.records_since_snapshot = 0
+            return path
+
+    def write_snapshot(self, handle, offset: int) -> None:
+        """
+        Write the whole book to an open snapshot file and sync it
+        :param handle: File opened for binary writing
+        :param offset: Journal size the snapshot covers
+        """
+        writer = SnapshotWriter(handle)
+        writer.write_int(offset)
+        writer.write_int(len(self.interest_rules))
+        for rule in self.interest_rules:
+            writer.write_int(rule['date'].toordinal())
+            writer.write_float(rule['rate'])
+            writer.write_int(rule['rate_units'])
+            writer.write_str(rule['rule_id'])
+        writer.write_array(array('l', (day.toordinal() for day in self.txn_no_id)))
+        writer.write_array(array('l', self.txn_no_id.values()))
+        writer.write_array(array('l', (year for year, _ in self.posted_months)))
+        writer.write_array(array('l', (month for _, month in self.posted_months)))
+        writer.write_int(len(self.accounts))
+        for account, details in self.accounts.items():
+            ledger, withdrawals = details['transactions'], details['withdrawals_by_day']
+            writer.write_str(account)
+            writer.write_int(details['balance_cents'])
+            for name in Ledger.columns:
+                writer.write_array(getattr(ledger, name))
+            writer.write_array(array('l', (year * 100 + month for year, month in ledger.month_slices)))
+            writer.write_array(array('l', (start for start, _ in ledger.month_slices.values())))
+            writer.write_array(array('l', (stop for _, stop in ledger.month_slices.values())))
+            writer.write_array(array('l', (day.toordinal() for day in withdrawals)))
+            writer.write_array(array('q', (value['amount'] for value in withdrawals.values())))
+            writer.write_array(array('l', (value['count'] for value in withdrawals.values())))
+            accrual = details['accrual']  # Its balance is balance_cents
+            writer.write_int(accrual.day or 0)
+            writer.write_array(array('l', (year * 100 + month for year, month in accrual.months)))
+            writer.write_array(array('q', (total >> ACCRUAL_SHIFT for total in accrual.months.values())))
+            writer.write_array(array('q', (total & ACCRUAL_MASK for total in accrual.months.values())))
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    def load_latest_snapshot(self) -> int:
+        """
+        Load the newest snapshot of the data directory, if any
+        :return: Journal size the snapshot covers
+        """
+        snapshots = sorted(name for name in os.listdir(self.data_dir)
+                           if name.startswith(SNAPSHOT_PREFIX) and name.endswith('.bin'))
+        if not snapshots:
+            return 0
+        with open(os.path.join(self.data_dir, snapshots[-1]), 'rb') as handle, \
+                mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if buffer[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                raise Exception(f'{snapshots[-1]} is not a snapshot.')
+            reader = SnapshotReader(memoryview(buffer))
+            try:
+                offset = self.read_snapshot(reader)
+            finally:
+                reader.buffer.release()
+        return offset
+
+    def read_snapshot(self, reader: SnapshotReader) -> int:
+        """
+        Replace the book with the snapshot's contents
+        :param reader
+        :return: Journal size the snapshot covers
+        """
+        offset = reader.read_int()
+        self.interest_rules = []
+        for _ in range(reader.read_int()):
+            rule_date = datetime.fromordinal(reader.read_int())
+            rate, rate_units, rule_id = reader.read_float(), reader.read_int(), reader.read_str()
+            self.interest_rules.append({"date": rule_date, "rule_id": rule_id, "rate": rate, "rate_units": rate_units})
+        self.rate_timeline = RateTimeline(self.interest_rules)
+        days, counts = reader.read_array(), reader.read_array()
+        self.txn_no_id = {datetime.fromordinal(day): count for day, count in zip(days, counts)}
+        years, months = reader.read_array(), reader.read_array()
+        self.posted_months = set(zip(years, months))
+        self.accounts = {}
+        for _ in range(reader.read_int()):
+            account, balance = reader.read_str(), reader.read_int()
+            ledger = Ledger()
+            for name in Ledger.columns:
+                setattr(ledger, name, reader.read_array())
+            months, starts, stops = reader.read_array(), reader.read_array(), reader.read_array()
+            ledger.month_slices = {divmod(month, 100): (start, stop)
+                                   for month, start, stop in zip(months, starts, stops)}
+            days, amounts, counts = reader.read_array(), reader.read_array(), reader.read_array()
+            withdrawals = {date.fromordinal(day): {"amount": amount, "count": count}
+                           for day, amount, count in zip(days, amounts, counts)}
+            accrual = InterestAccrual()
+            accrual.day, accrual.balance = reader.read_int() or None, balance
+            months, highs, lows = reader.read_array(), reader.read_array(), reader.read_array()
+            accrual.months = {divmod(month, 100): (high << ACCRUAL_SHIFT) | low
+                              for month, high, low in zip(months, highs, lows)}
+            self.accounts[account] = {"balance": from_cents(balance), "balance_cents": balance,
+                                      "transactions": ledger, "withdrawals_by_day": withdrawals, "accrual": accrual}
+        return offset
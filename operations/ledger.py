@@ -0,0 +1,232 @@
+import bisect
+from array import array
+from collections.abc import Mapping
+from datetime import date, datetime
+
+from constants import MAX_CENTS
+
+TYPE_CODES = {'D': 0, 'W': 1, 'I': 2}
+TYPES = {code: txn_type for txn_type, code in TYPE_CODES.items()}
+
+
+class TransactionView(Mapping):
+    """
+    Read-only dict-like view of one ledger row, values are only built when read
+    """
+    __slots__ = ('ledger', 'index')
+    keys_order = ("date", "id", "type", "amount", "current_balance")
+
+    def __init__(self, ledger, index: int):
+        self.ledger = ledger
+        self.index = index
+
+    def __getitem__(self, key: str):
+        ledger, index = self.ledger, self.index
+        if key == "date":
+            return datetime.fromordinal(ledger.days[index])
+        if key == "id":
+            return f"{datetime.fromordinal(ledger.days[index]).strftime('%Y%m%d')}-{ledger.seqs[index]}"
+        if key == "type":
+            return TYPES[ledger.types[index]]
+        if key == "amount":
+            return ledger.amounts[index] / 100
+        if key == "current_balance":
+            return ledger.balances[index] / 100
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.keys_order)
+
+    def __len__(self) -> int:
+        return len(self.keys_order)
+
+
+class Ledger:
+    """
+    Transactions of one account stored as parallel typed columns instead of one dict per transaction.
+    Amounts and running balances are kept in cents, dates as ordinals and the <n> of a
+    <YYYYMMDD>-<n> transaction id as a per-day sequence number.
+    Running credits (deposits and interest) sit next to running balances, so the flows of any range
+    are the difference of two prefix values.
+    Rows are kept in date order and month_slices maps (year, month) to the [start, stop) rows of that month.
+    The days and running balances double as the account's balance history: balances only change on
+    days with a transaction, so queries bisect the rows instead of storing a balance per calendar day.
+    """
+    __slots__ = ('days', 'seqs', 'types', 'amounts', 'balances', 'credits', 'month_slices')
+    columns = ('days', 'seqs', 'types', 'amounts', 'balances', 'credits')
+
+    def __init__(self):
+        self.days = array('l')
+        self.seqs = array('l')
+        self.types = array('b')
+        self.amounts = array('q')
+        self.balances = array('q')
+        self.credits = array('q')
+        self.month_slices = {}
+
+    @classmethod
+    def from_rows(cls, rows) -> 'Ledger':
+        """
+        Ledger holding rows that are already in date order
+        :param rows: (day ordinal, sequence number, type code, amount, balance, credits) tuples
+        """
+        ledger = cls()
+        for day, seq, code, amount, balance, credits in rows:
+            txn_date = date.fromordinal(day)
+            month = (txn_date.year, txn_date.month)
+            start, stop = ledger.month_slices.get(month, (len(ledger.days), len(ledger.days)))
+            ledger.month_slices[month] = (start, stop + 1)
+            ledger.days.append(day)
+            ledger.seqs.append(seq)
+            ledger.types.append(code)
+            ledger.amounts.append(amount)
+            ledger.balances.append(balance)
+            ledger.credits.append(credits)
+        return ledger
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def __getitem__(self, index: int) -> TransactionView:
+        if index < 0:
+            index += len(self.days)
+        if not 0 <= index < len(self.days):
+            raise IndexError(index)
+        return TransactionView(self, index)
+
+    def __iter__(self):
+        return (TransactionView(self, index) for index in range(len(self.days)))
+
+    def insert(self, day: int, seq: int, txn_type: str, amount: int) -> None:
+        """
+        Add a transaction after every transaction of the same or earlier days.
+        Running balances and credits of later rows are moved by the amount when the transaction is backdated.
+        :param day: Date ordinal
+        :param seq: Sequence number of the transaction within its day
+        :param txn_type: D, W or I
+        :param amount: In cents
+        """
+        signed = -amount if txn_type == 'W' else amount
+        credit = 0 if txn_type == 'W' else amount
+        index = len(self.days)
+        if index and day < self.days[-1]:
+            index = bisect.bisect_right(self.days, day)
+        balance = (self.balances[index - 1] if index else 0) + signed
+        credits = (self.credits[index - 1] if index else 0) + credit
+        # Checked before any column changes, so a rejected transaction leaves the ledger whole
+        highest_balance = max(self.balances[index:], default=balance - signed) + signed
+        if max(amount, balance, highest_balance, (self.credits[-1] if self.credits else 0) + credit) > MAX_CENTS:
+            raise Exception('Amount is too large for the account.')
+        self.days.insert(index, day)
+        self.seqs.insert(index, seq)
+        self.types.insert(index, TYPE_CODES[txn_type])
+        self.amounts.insert(index, amount)
+        self.balances.insert(index, balance)
+        self.credits.insert(index, credits)
+        for later in range(index + 1, len(self.balances)):
+            self.balances[later] += signed
+            self.credits[later] += credit
+        self.update_month_slices(date.fromordinal(day), index)
+
+    def update_month_slices(self, txn_date: date, index: int) -> None:
+        """
+        Account for a row inserted at index in the month slices
+        :param txn_date
+        :param index
+        """
+        month = (txn_date.year, txn_date.month)
+        if index + 1 < len(self.days):  # Backdated, rows of later months have moved down by one
+            for key, (start, stop) in self.month_slices.items():
+                if key > month:
+                    self.month_slices[key] = (start + 1, stop + 1)
+        start, stop = self.month_slices.get(month, (index, index))
+        self.month_slices[month] = (start, stop + 1)
+
+    def month_rows(self, year: int, month: int) -> list:
+        """
+        Views of the transactions of a month in date order
+        :param year
+        :param month
+        """
+        start, stop = self.month_slices.get((year, month), (0, 0))
+        return [TransactionView(self, index) for index in range(start, stop)]
+
+    def window(self, start: int, end: int):
+        """
+        Copy of the rows in [start, end) preceded by the last row before start, enough to compute
+        balances, interest and statement rows of that range.
+        :param start: Day ordinal
+        :param end: Day ordinal, exclusive
+        """
+        first = max(bisect.bisect_left(self.days, start) - 1, 0)
+        last = bisect.bisect_left(self.days, end)
+        window = Ledger()
+        for name in self.columns:
+            setattr(window, name, getattr(self, name)[first:last])
+        for month, (month_start, month_stop) in self.month_slices.items():
+            if month_stop > first and month_start < last:
+                window.month_slices[month] = (max(month_start, first) - first, min(month_stop, last) - first)
+        return window
+
+    def balance_before(self, day: int) -> int:
+        """
+        Balance in cents at the end of the last day before day
+        :param day: Day ordinal
+        """
+        index = bisect.bisect_left(self.days, day)
+        return self.balances[index - 1] if index else 0
+
+    def range_totals(self, start: int, end: int) -> tuple:
+        """
+        (opening balance, credits, debits, closing balance) in cents of [start, end), from the prefix columns
+        :param start: Day ordinal
+        :param end: Day ordinal, exclusive
+        """
+        first = bisect.bisect_left(self.days, start)
+        last = bisect.bisect_left(self.days, end)
+        opening = self.balances[first - 1] if first else 0
+        closing = self.balances[last - 1] if last else 0
+        credits = (self.credits[last - 1] if last else 0) - (self.credits[first - 1] if first else 0)
+        return opening, credits, credits - (closing - opening), closing
+
+    def balance_on(self, day: int) -> int:
+        """
+        Balance in cents at the end of day
+        :param day: Day ordinal
+        """
+        return self.balance_before(day + 1)
+
+    def balance_segments(self, start: int, end: int) -> list:
+        """
+        (start, end, balance in cents) runs of constant end of day balance covering [start, end)
+        :param start: Day ordinal
+        :param end: Day ordinal, exclusive
+        """
+        segments = []
+        seg_start, balance = start, self.balance_before(start)
+        for day, point_balance in self.balance_points(start, end):
+            if day > seg_start:
+                segments.append((seg_start, day, balance))
+                seg_start = day
+            if day >= start:
+                balance = point_balance
+        segments.append((seg_start, end, balance))
+        return segments
+
+    def balance_points(self, start: int = None, end: int = None) -> list:
+        """
+        Sorted (day ordinal, end of day balance in cents) change points, each balance holding until the next point.
+        When a range is given only the points inside [start, end) are returned, preceded by the last
+        point before start.
+        :param start: Day ordinal
+        :param end: Day ordinal, exclusive
+        """
+        first = bisect.bisect_left(self.days, start) if start is not None else 0
+        last = bisect.bisect_left(self.days, end) if end is not None else len(self.days)
+        points = []
+        if first:
+            points.append((self.days[first - 1], self.balances[first - 1]))
+        for index in range(first, last):
+            if index + 1 == last or self.days[index + 1] != self.days[index]:
+                points.append((self.days[index], self.balances[index]))
+        return points
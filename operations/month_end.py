@@ -0,0 +1,157 @@
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from constants import EOM_WORKERS
+from instrumentation import instrumented
+from utils import from_cents
+from operations.interest import Interest
+from operations.interest_engine import RateTimeline, ledger_month_interest, month_bounds, round_interest
+
+
+def overflows_int64(balances: np.ndarray, rates: np.ndarray) -> bool:
+    """
+    Whether a sum of balance x rate over the days of rates could overflow int64
+    :param balances: Day x account balances in cents
+    :param rates: Rates by day, one column per timeline
+    """
+    return int(np.abs(balances).max(initial=0)) * int(rates.max(initial=0)) * len(rates) > np.iinfo(np.int64).max
+
+
+def month_end_shard(year_month: datetime, timeline: RateTimeline, ledgers: dict) -> list:
+    """
+    Interest and statement lines of every account of a shard, run inside a worker process
+    :param year_month
+    :param timeline: Interest rules of the book
+    :param ledgers: Ledger windows of the month by account
+    """
+    results = []
+    for account, ledger in ledgers.items():
+        interest = ledger_month_interest(ledger, timeline, year_month)
+        results.append((account, from_cents(interest), Interest.build_statement_lines(ledger, year_month, interest)))
+    return results
+
+
+class MonthEnd:
+
+    def __init__(self):
+        self.posted_months = set()
+        self.eom_pool = None
+        self.eom_pool_workers = 0
+
+    def build_balance_matrix(self, year_month: datetime, accounts: list) -> np.ndarray:
+        """
+        Dense day x account matrix of end of day balances in cents for the month
+        :param year_month
+        :param accounts: Column order of the matrix
+        """
+        start, end = month_bounds(year_month)
+        days = end - start
+        balances = np.zeros((days, len(accounts)), dtype=np.int64)
+        known = np.zeros((days, len(accounts)), dtype=bool)
+        known[0] = True
+        for column, account in enumerate(accounts):
+            for day, balance in self.accounts[account]['transactions'].balance_points(start, end):
+                balances[max(day - start, 0), column] = balance
+                known[max(day - start, 0), column] = True
+        # Forward fill every day without a change point with the last known balance of its account
+        filled = np.where(known, np.arange(days)[:, None], 0)
+        np.maximum.accumulate(filled, axis=0, out=filled)
+        return balances[filled, np.arange(len(accounts))]
+
+    def build_rate_vector(self, year_month: datetime, interest_rules: list = None) -> np.ndarray:
+        """
+        Rate in RATE_SCALE units of a percent applying on each day of the month, 0 before the first rule
+        :param year_month
+        :param interest_rules: Date sorted rules, the book's rules when omitted
+        """
+        interest_rules = self.interest_rules if interest_rules is None else interest_rules
+        start, end = month_bounds(year_month)
+        starts = np.array([rule['date'].toordinal() for rule in interest_rules], dtype=np.int64)
+        rates = np.array([rule['rate_units'] for rule in interest_rules] + [0], dtype=np.int64)
+        index = np.searchsorted(starts, np.arange(start, end), side='right') - 1
+        return rates[index]  # index -1 picks the trailing 0
+
+    @instrumented('calculate_eom_interest')
+    def calculate_eom_interest(self, year_month: datetime, post: bool = False) -> dict:
+        """
+        Calculate interest of the month for every account at once
+        :param year_month
+        :param post: Add the interest as an "I" transaction on the first day of the next month
+        :return: Interest by account
+        """
+        accounts = sorted(self.accounts)
+        if not accounts:
+            return {}
+        balances = self.build_balance_matrix(year_month, accounts)
+        rates = self.build_rate_vector(year_month)
+        if overflows_int64(balances, rates):
+            balances = balances.astype(object)  # Exact Python ints where int64 sums could overflow
+        totals = (balances * rates[:, None]).sum(axis=0)
+        interests = {account: round_interest(int(total)) for account, total in zip(accounts, totals)}
+        if post:
+            self.post_eom_interest(year_month, interests)
+        return {account: from_cents(interest) for account, interest in interests.items()}
+
+    @instrumented('run_month_end')
+    def run_month_end(self, year_month: datetime, workers: int = EOM_WORKERS) -> dict:
+        """
+        Calculate interest and statement lines of the month for every account, sharding accounts
+        by account id across worker processes. Only the month's rows of each ledger are sent to workers.
+        :param year_month
+        :param workers: Number of processes of the reusable pool, 1 runs in this process
+        :return: {"interest", "lines"} by account, in account order
+        """
+        if workers < 1:
+            raise Exception('Number of workers must be at least 1.')
+        start, end = month_bounds(year_month)
+        timeline = self.rate_timeline
+        shards = [{} for _ in range(workers)]
+        for account in self.accounts:
+            shard = zlib.crc32(account.encode()) % workers
+            shards[shard][account] = self.accounts[account]['transactions'].window(start, end)
+        shards = [shard for shard in shards if shard]
+        if workers == 1:
+            results = [month_end_shard(year_month, timeline, shard) for shard in shards]
+        else:
+            results = list(self.get_eom_pool(workers).map(month_end_shard, [year_month] * len(shards),
+                                                          [timeline] * len(shards), shards))
+        merged = sorted(result for shard_results in results for result in shard_results)
+        return {account: {"interest": interest, "lines": lines} for account, interest, lines in merged}
+
+    def get_eom_pool(self, workers: int) -> ProcessPoolExecutor:
+        """
+        Process pool kept between month-end runs, replaced when the number of workers changes
+        :param workers
+        """
+        if self.eom_pool is None or self.eom_pool_workers != workers:
+            self.close_eom_pool()
+            self.eom_pool, self.eom_pool_workers = ProcessPoolExecutor(max_workers=workers), workers
+        return self.eom_pool
+
+    def close_eom_pool(self) -> None:
+        """Stop the month-end worker processes, if any"""
+        if self.eom_pool is not None:
+            self.eom_pool.shutdown()
+            self.eom_pool = None
+
+    def post_eom_interest(self, year_month: datetime, interests: dict) -> None:
+        """
+        Add interest transactions effective on the first day of the next month, so the posted amount
+        earns interest from then on and leaves the month's own interest and statement unchanged
+        :param year_month
+        :param interests: Interest in cents by account
+        """
+        month = (year_month.year, year_month.month)
+        if month in self.posted_months:
+            raise Exception('Interest is already posted for this month.')
+        date = datetime.fromordinal(month_bounds(year_month)[1])
+        with self.book_lock:
+            for account, interest in interests.items():
+                if interest > 0:
+                    self.txn_no_id[date] = self.txn_no_id[date] + 1 if self.txn_no_id.get(date) else 1
+                    self.add_transaction(date, account, 'i', interest)
+            self.posted_months.add(month)
+            self.journal_posted_month(month)
@@ -1,9 +1,19 @@
 from operations.transaction import Transaction
 from operations.interest import Interest
+from operations.ingestion import Ingestion
+from operations.month_end import MonthEnd
+from operations.journal import Journal
+from operations.statistics import Statistics
+from operations.statements import Statements
+from operations.export import Export
+from operations.scenarios import Scenarios
 
 
-class  BankOperationsMixins(Transaction, Interest):
+class  BankOperationsMixins(Transaction, Interest, Ingestion, MonthEnd, Journal, Statistics, Statements, Export,
+                            Scenarios):
 
     def __init__(self):
         Transaction.__init__(self)
         Interest.__init__(self)
+        MonthEnd.__init__(self)
+        Journal.__init__(self)
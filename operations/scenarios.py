@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import numpy as np
+
+from utils import from_cents
+from instrumentation import instrumented
+from operations.interest_engine import round_interest
+from operations.month_end import overflows_int64
+
+
+class Scenarios:
+
+    def build_scenario_rules(self, candidate_rules: list, include_live_rules: bool = True) -> list:
+        """
+        Date sorted rules of a scenario, built on a copy so the book's rules are left untouched
+        :param candidate_rules: <Date> <RuleId> <Rate in %> rows, applied in order as define_interest_rule would
+        :param include_live_rules: Start from the book's rules rather than from no rules
+        """
+        interest_rules = list(self.interest_rules) if include_live_rules else []
+        for interest_rule in candidate_rules:
+            self.insert_interest_rule(interest_rules, *self.validate_new_interest_rule(interest_rule))
+        return interest_rules
+
+    @instrumented('evaluate_rate_scenarios')
+    def evaluate_rate_scenarios(self, year_month: datetime, scenarios: dict, include_live_rules: bool = True) -> dict:
+        """
+        Interest of the month for every account under each candidate rule timeline, in one pass:
+        the day x account balance matrix is multiplied by a day x scenario rate matrix
+        :param year_month
+        :param scenarios: Candidate <Date> <RuleId> <Rate in %> rows by scenario name, [] for the live rules
+        :param include_live_rules: Apply the candidates on top of the book's rules
+        :return: {"accounts": {account: {scenario: interest}}, "totals": {scenario: interest}}
+        """
+        if not scenarios:
+            raise Exception('At least one scenario is required.')
+        names = list(scenarios)
+        rates = np.column_stack([
+            self.build_rate_vector(year_month, self.build_scenario_rules(scenarios[name], include_live_rules))
+            for name in names
+        ])
+        accounts = sorted(self.accounts)
+        interests = np.zeros((len(accounts), len(names)), dtype=np.int64)
+        if accounts:
+            balances = self.build_balance_matrix(year_month, accounts)
+            if overflows_int64(balances, rates):
+                balances, rates = balances.astype(object), rates.astype(object)  # Exact Python ints
+            interests = balances.T @ rates
+        cents = [[round_interest(int(total)) for total in row] for row in interests]
+        return {
+            "accounts": {account: {name: from_cents(value) for name, value in zip(names, row)}
+                         for account, row in zip(accounts, cents)},
+            "totals": {name: from_cents(sum(row[column] for row in cents)) for column, name in enumerate(names)},
+        }
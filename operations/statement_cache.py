@@ -0,0 +1,75 @@
+import threading
+from collections import OrderedDict
+
+
+class StatementCache:
+    """
+    Bounded LRU cache of monthly interest and statement lines keyed by (account, (year, month))
+    """
+
+    def __init__(self, max_size: int):
+        if max_size < 1:
+            raise Exception('Statement cache size must be at least 1.')
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.months_by_account = {}
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self.lock = threading.RLock()
+
+    def get(self, account: str, month: tuple):
+        """
+        Cached entry of an account's month, None on a miss
+        :param account
+        :param month: (year, month)
+        """
+        with self.lock:
+            entry = self.entries.get((account, month))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end((account, month))
+            return entry
+
+    def put(self, account: str, month: tuple, entry: dict) -> None:
+        """
+        Store an account's month, evicting the least recently used entry when full
+        :param account
+        :param month: (year, month)
+        :param entry
+        """
+        with self.lock:
+            self.entries[(account, month)] = entry
+            self.entries.move_to_end((account, month))
+            self.months_by_account.setdefault(account, set()).add(month)
+            if len(self.entries) > self.max_size:
+                (evicted_account, evicted_month), _ = self.entries.popitem(last=False)
+                self.months_by_account[evicted_account].discard(evicted_month)
+                self.evictions += 1
+
+    def invalidate_account(self, account: str, from_month: tuple) -> None:
+        """
+        Drop an account's months on or after from_month
+        :param account
+        :param from_month: (year, month)
+        """
+        with self.lock:
+            months = self.months_by_account.get(account, set())
+            for month in [month for month in months if month >= from_month]:
+                del self.entries[(account, month)]
+                months.discard(month)
+                self.invalidations += 1
+
+    def invalidate_months(self, from_month: tuple) -> None:
+        """
+        Drop every account's months on or after from_month
+        :param from_month: (year, month)
+        """
+        with self.lock:
+            for account in list(self.months_by_account):
+                self.invalidate_account(account, from_month)
+
+    def stats(self) -> dict:
+        """Hit, miss, eviction and invalidation counters with the current size"""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "invalidations": self.invalidations, "size": len(self.entries), "max_size": self.max_size}
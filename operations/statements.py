@@ -0,0 +1,91 @@
+from datetime import datetime
+
+from logger import logger
+from messages import RANGE_STATEMENT
+from utils import from_cents
+from instrumentation import instrumented
+from operations.interest_engine import month_bounds
+
+
+class Statements:
+
+    def validate_range_statement_input(self, account_range: str) -> tuple:
+        """
+        Validate input account and month range, either <Account> <From Year><Month> <To Year><Month>
+        or <Account> YTD <Year><Month> for January to that month
+        :param account_range:
+        :return: account, first month, last month
+        """
+        account_range = account_range.strip().split()
+        if len(account_range) != 3:
+            raise Exception('Statement range is not in correct format.')
+        account, from_month, to_month = account_range
+        to_month = datetime.strptime(to_month, "%Y%m")
+        from_month = to_month.replace(month=1) if from_month.upper() == 'YTD' else datetime.strptime(from_month, "%Y%m")
+        if from_month > to_month:
+            raise Exception('Statement range must not end before it starts.')
+        if account not in self.accounts:
+            raise Exception('Provided account does not exist.')
+        return account, from_month, to_month
+
+    @instrumented('get_range_statement')
+    def get_range_statement(self, account_range: str) -> dict:
+        """
+        Opening and closing balances, credits, debits and interest of every month of a range and of the
+        whole range. Balances and flows are read from the ledger's prefix columns and interest from the
+        account's accrual, so the cost grows with the number of months, not with the history.
+        :param account_range: <Account> <From Year><Month> <To Year><Month> or <Account> YTD <Year><Month>
+        """
+        account, from_month, to_month = self.validate_range_statement_input(account_range)
+        ledger = self.accounts[account]['transactions']
+        months, total_interest = [], 0
+        year, month = from_month.year, from_month.month
+        while (year, month) <= (to_month.year, to_month.month):
+            year_month = datetime(year, month, 1)
+            interest = self.get_statement_entry(year_month, account)["interest"]
+            total_interest += interest
+            months.append(self.range_statement_row(year_month.strftime("%Y%m"), ledger.range_totals(
+                *month_bounds(year_month)), interest))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        start, end = month_bounds(from_month)[0], month_bounds(to_month)[1]
+        statement = self.range_statement_row('Total', ledger.range_totals(start, end), total_interest)
+        statement.update(account=account, months=months)
+        return statement
+
+    @staticmethod
+    def range_statement_row(month: str, totals: tuple, interest: int) -> dict:
+        """
+        One row of a range statement with amounts in dollars
+        :param month
+        :param totals: (opening balance, credits, debits, closing balance) in cents
+        :param interest: In cents
+        """
+        opening, credits, debits, closing = (from_cents(value) for value in totals)
+        return {"month": month, "opening_balance": opening, "credits": credits, "debits": debits,
+                "interest": from_cents(interest), "closing_balance": closing}
+
+    @staticmethod
+    def format_range_statement(statement: dict) -> list:
+        """
+        Format a range statement as table lines, one per month followed by the range total
+        :param statement
+        """
+        keys = ('month', 'opening_balance', 'credits', 'debits', 'interest', 'closing_balance')
+        find_space = lambda value: 20 - len(str(value))
+        lines = [f'Account: {statement["account"]}', RANGE_STATEMENT.format(*(
+            value + ' ' * find_space(value) for value in ('Month', 'Opening', 'Credits', 'Debits', 'Interest',
+                                                          'Closing')
+        ))]
+        for row in statement["months"] + [statement]:
+            lines.append(RANGE_STATEMENT.format(*(str(row[key]) + ' ' * find_space(row[key]) for key in keys)))
+        return lines
+
+    @instrumented('handle_show_range_statement')
+    def handle_show_range_statement(self, account_range: str) -> dict:
+        """
+        Show the monthly summary of an account over a range of months
+        :param account_range: <Account> <From Year><Month> <To Year><Month> or <Account> YTD <Year><Month>
+        """
+        statement = self.get_range_statement(account_range)
+        logger.info('\n'.join(self.format_range_statement(statement)))
+        return statement
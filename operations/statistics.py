@@ -0,0 +1,60 @@
+from logger import logger
+from messages import STATS, STATS_OFF, STATS_SWITCHED
+from instrumentation import stats
+
+
+class Statistics:
+
+    @staticmethod
+    def enable_stats(enabled: bool = True) -> None:
+        """
+        Switch timing of instrumented operations on or off
+        :param enabled
+        """
+        stats.enabled = enabled
+
+    def handle_stats(self, switch: str) -> None:
+        """
+        Switch timing on or off, or print the statistics
+        :param switch: on, off or blank
+        """
+        switch = switch.strip().lower()
+        if not switch:
+            self.print_stats()
+        elif switch in ('on', 'off'):
+            self.enable_stats(switch == 'on')
+            logger.info(STATS_SWITCHED.format(switch))
+        else:
+            raise Exception('Enter on, off or blank.')
+
+    def get_stats(self) -> dict:
+        """
+        Per operation call counts and latencies, with the sizes of the main data structures
+        """
+        return {
+            "enabled": stats.enabled,
+            "operations": stats.summary(),
+            "sizes": {
+                "accounts": len(self.accounts),
+                "transactions": sum(len(details['transactions']) for details in self.accounts.values()),
+                "interest_rules": len(self.interest_rules),
+                "statement_cache": len(self.statement_cache.entries),
+            },
+            "statement_cache": self.statement_cache.stats(),
+        }
+
+    def print_stats(self) -> None:
+        """Console log operation statistics and data structure sizes"""
+        current = self.get_stats()
+        find_space = lambda value: 20 - len(str(value))
+        lines = [] if current["enabled"] else [STATS_OFF]
+        lines.append(STATS.format(*(
+            value + ' ' * find_space(value) for value in ('Operation', 'Calls', 'Total (ms)', 'p50 (us)', 'p99 (us)')
+        )))
+        for name, operation in current["operations"].items():
+            values = [name] + [str(operation[key]) for key in ('calls', 'total_ms', 'p50_us', 'p99_us')]
+            lines.append(STATS.format(*(value + ' ' * find_space(value) for value in values)))
+        lines.extend(f'{name}: {size}' for name, size in current["sizes"].items())
+        lines.extend(f'statement_cache {name}: {value}' for name, value in current["statement_cache"].items()
+                     if name not in ('size', 'max_size'))
+        logger.info('\n'.join(lines))
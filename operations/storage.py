@@ -0,0 +1,327 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date
+from typing import Iterator
+
+from constants import MAX_CENTS, SQLITE_BATCH_SIZE, SQLITE_POOL_SIZE, SQLITE_STATEMENT_CACHE
+from operations.ledger import Ledger, TYPE_CODES
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS transactions (
+    account TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    type INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    balance INTEGER NOT NULL,
+    credits INTEGER NOT NULL,
+    PRIMARY KEY (account, day, seq)
+) WITHOUT ROWID
+'''
+COLUMNS = 'day, seq, type, amount, balance, credits'
+INSERT_ROW = 'INSERT INTO transactions (account, day, seq, type, amount, balance, credits) VALUES (?, ?, ?, ?, ?, ?, ?)'
+SHIFT_LATER_ROWS = 'UPDATE transactions SET balance = balance + ?, credits = credits + ? WHERE account = ? AND day > ?'
+LAST_ROW_BEFORE = (f'SELECT {COLUMNS} FROM transactions WHERE account = ? AND day < ? '
+                   'ORDER BY day DESC, seq DESC LIMIT 1')
+ROWS_IN_RANGE = f'SELECT {COLUMNS} FROM transactions WHERE account = ? AND day >= ? AND day < ? ORDER BY day, seq'
+ROW_AT = f'SELECT {COLUMNS} FROM transactions WHERE account = ? ORDER BY day {{0}}, seq {{0}} LIMIT 1 OFFSET ?'
+DAILY_WITHDRAWALS = ('SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM transactions '
+                     'WHERE account = ? AND day = ? AND type = ?')
+ACCOUNTS = 'SELECT account, COUNT(*), MIN(day), MAX(day) FROM transactions GROUP BY account'
+SEQUENCES = 'SELECT day, MAX(seq) FROM transactions GROUP BY day'
+LAST_DAY = date.max.toordinal() + 1
+
+
+class MemoryStorage:
+    """
+    Default storage: ledgers and the daily withdrawal index of every account live in process memory
+    """
+    name = 'memory'
+
+    def new_ledger(self, account: str) -> Ledger:
+        return Ledger()
+
+    def record_withdrawal(self, details: dict, day: date, amount: int) -> None:
+        """
+        Add a withdrawal to the account's daily totals
+        :param details: The account's entry of accounts
+        :param day
+        :param amount: In cents
+        """
+        withdrawals = details["withdrawals_by_day"].setdefault(day, {"amount": 0, "count": 0})
+        withdrawals["amount"] += amount
+        withdrawals["count"] += 1
+
+    def daily_withdrawals(self, account: str, details: dict, day: date) -> dict:
+        """
+        Total amount in cents and count of an account's withdrawals on a day
+        :param account
+        :param details: The account's entry of accounts
+        :param day
+        """
+        return details["withdrawals_by_day"].get(day, {"amount": 0, "count": 0})
+
+    def load_accounts(self) -> Iterator[tuple]:
+        return iter(())
+
+    def load_sequences(self) -> dict:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class ConnectionPool:
+    """
+    Fixed set of connections to one database handed out to one thread at a time.
+    Each connection keeps its own cache of prepared statements.
+    """
+
+    def __init__(self, path: str, size: int = SQLITE_POOL_SIZE):
+        self.connections = queue.Queue()
+        for _ in range(size):
+            connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30,
+                                         cached_statements=SQLITE_STATEMENT_CACHE)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.connections.put(connection)
+        self.size = size
+
+    @contextmanager
+    def connection(self):
+        connection = self.connections.get()
+        try:
+            yield connection
+        finally:
+            self.connections.put(connection)
+
+    def close(self) -> None:
+        for _ in range(self.size):
+            self.connections.get().close()
+
+
+class SqliteStorage:
+    """
+    Ledgers kept in a local SQLite database indexed on (account, date), for books larger than memory.
+    Transactions dated on or after an account's latest day are buffered and inserted in batches of
+    SQLITE_BATCH_SIZE rows inside one transaction. Every query except the daily withdrawal limit
+    check writes the buffer first.
+    Interest rules are not stored, load them on start.
+    """
+    name = 'sqlite'
+
+    def __init__(self, path: str, pool_size: int = SQLITE_POOL_SIZE, batch_size: int = SQLITE_BATCH_SIZE):
+        self.pool = ConnectionPool(path, pool_size)
+        self.batch_size = batch_size
+        self.pending = []
+        self.lock = threading.RLock()
+        with self.pool.connection() as connection:
+            connection.execute(SCHEMA)
+
+    def new_ledger(self, account: str) -> 'SqliteLedger':
+        return SqliteLedger(self, account)
+
+    def record_withdrawal(self, details: dict, day: date, amount: int) -> None:
+        pass  # Withdrawals are summed from the indexed rows
+
+    def daily_withdrawals(self, account: str, details: dict, day: date) -> dict:
+        """
+        Withdrawals already inserted, summed by the index, plus the matching buffered rows,
+        so limit checks do not write the buffer
+        """
+        day, code = day.toordinal(), TYPE_CODES['W']
+        with self.lock, self.pool.connection() as connection:
+            amount, count = connection.execute(DAILY_WITHDRAWALS, (account, day, code)).fetchone()
+            for row in self.pending:
+                if row[0] == account and row[1] == day and row[3] == code:
+                    amount += row[4]
+                    count += 1
+        return {"amount": amount, "count": count}
+
+    def append(self, row: tuple) -> None:
+        """
+        Buffer a row added after every row of its account
+        :param row: (account, day, seq, type code, amount, balance, credits)
+        """
+        with self.lock:
+            self.pending.append(row)
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """Insert the buffered rows in one transaction"""
+        if not self.pending:
+            return
+        with self.lock, self.pool.connection() as connection:
+            connection.execute('BEGIN')
+            try:
+                connection.executemany(INSERT_ROW, self.pending)
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')  # Keep the rows buffered and the connection usable
+                raise
+            self.pending = []
+
+    def insert_backdated(self, row: tuple) -> None:
+        """
+        Insert a row dated before later rows of its account, moving their running balances and credits
+        :param row: (account, day, seq, type code, amount, balance, credits) with balance and credits
+                    holding the signed amount and credit to add
+        """
+        account, day, seq, code, amount, signed, credit = row
+        with self.lock:
+            self.flush()
+            with self.pool.connection() as connection:
+                connection.execute('BEGIN')
+                try:
+                    previous = connection.execute(LAST_ROW_BEFORE, (account, day + 1)).fetchone()
+                    balance, credits = (previous[4], previous[5]) if previous else (0, 0)
+                    connection.execute(SHIFT_LATER_ROWS, (signed, credit, account, day))
+                    connection.execute(INSERT_ROW, (account, day, seq, code, amount, balance + signed,
+                                                    credits + credit))
+                    connection.execute('COMMIT')
+                except Exception:
+                    connection.execute('ROLLBACK')  # Later rows keep their balances
+                    raise
+
+    def query(self, sql: str, parameters: tuple) -> list:
+        self.flush()
+        with self.pool.connection() as connection:
+            return connection.execute(sql, parameters).fetchall()
+
+    def query_one(self, sql: str, parameters: tuple):
+        self.flush()
+        with self.pool.connection() as connection:
+            return connection.execute(sql, parameters).fetchone()
+
+    def load_accounts(self) -> Iterator[tuple]:
+        """Yield (account, ledger, last day, balance in cents) for every account already in the database"""
+        for account, count, first_day, last_day in self.query(ACCOUNTS, ()):
+            ledger = SqliteLedger(self, account, count, first_day, last_day)
+            yield account, ledger, last_day, ledger.balance
+
+    def load_sequences(self) -> dict:
+        """Last sequence number used on each day by day ordinal"""
+        return dict(self.query(SEQUENCES, ()))
+
+    def close(self) -> None:
+        self.flush()
+        self.pool.close()
+
+
+class SqliteLedger:
+    """
+    Ledger of one account answering the Ledger queries with indexed range queries.
+    Only the row count, the first and last day and the latest running totals are kept in memory.
+    Range results are loaded into a Ledger, so rows read the same as with the memory storage.
+    """
+
+    def __init__(self, storage: SqliteStorage, account: str, count: int = 0, first_day: int = None,
+                 last_day: int = None):
+        self.storage = storage
+        self.account = account
+        self.count = count
+        self.first_day = first_day
+        self.last_day = last_day
+        self.balance = self.credits = 0
+        if count:
+            _, _, _, _, self.balance, self.credits = storage.query_one(LAST_ROW_BEFORE, (account, LAST_DAY))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int):
+        if not -self.count <= index < self.count:
+            raise IndexError(index)
+        order, offset = ('DESC', -index - 1) if index < 0 else ('ASC', index)
+        return Ledger.from_rows([self.storage.query_one(ROW_AT.format(order), (self.account, offset))])[0]
+
+    def __iter__(self):
+        return iter(self.rows(0, LAST_DAY))
+
+    def rows(self, start: int, end: int) -> Ledger:
+        """
+        Rows in [start, end) loaded into a Ledger
+        :param start: Day ordinal
+        :param end: Day ordinal, exclusive
+        """
+        return Ledger.from_rows(self.storage.query(ROWS_IN_RANGE, (self.account, start, end)))
+
+    def insert(self, day: int, seq: int, txn_type: str, amount: int) -> None:
+        """
+        Add a transaction after every transaction of the same or earlier days
+        :param day: Date ordinal
+        :param seq: Sequence number of the transaction within its day
+        :param txn_type: D, W or I
+        :param amount: In cents
+        """
+        signed = -amount if txn_type == 'W' else amount
+        credit = 0 if txn_type == 'W' else amount
+        if max(amount, self.balance + signed, self.credits + credit) > MAX_CENTS:
+            raise Exception('Amount is too large for the account.')
+        if self.count and day < self.last_day:
+            self.storage.insert_backdated((self.account, day, seq, TYPE_CODES[txn_type], amount, signed, credit))
+        else:
+            self.storage.append((self.account, day, seq, TYPE_CODES[txn_type], amount, self.balance + signed,
+                                 self.credits + credit))
+            self.last_day = day
+        self.balance += signed
+        self.credits += credit
+        self.first_day = day if self.first_day is None else min(self.first_day, day)
+        self.count += 1
+
+    def month_rows(self, year: int, month: int) -> list:
+        """
+        Views of the transactions of a month in date order
+        :param year
+        :param month
+        """
+        start = date(year, month, 1)
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        return self.rows(start.toordinal(), end.toordinal()).month_rows(year, month)
+
+    def window_rows(self, start: int, end: int) -> list:
+        previous = self.storage.query_one(LAST_ROW_BEFORE, (self.account, start))
+        return ([previous] if previous else []) + self.storage.query(ROWS_IN_RANGE, (self.account, start, end))
+
+    def window(self, start: int, end: int) -> Ledger:
+        """
+        Rows in [start, end) preceded by the last row before start, as a Ledger
+        :param start: Day ordinal
+        :param end: Day ordinal, exclusive
+        """
+        return Ledger.from_rows(self.window_rows(start, end))
+
+    def balance_before(self, day: int) -> int:
+        """
+        Balance in cents at the end of the last day before day
+        :param day: Day ordinal
+        """
+        previous = self.storage.query_one(LAST_ROW_BEFORE, (self.account, day))
+        return previous[4] if previous else 0
+
+    def balance_points(self, start: int = None, end: int = None) -> list:
+        """
+        Sorted (day ordinal, end of day balance in cents) change points, see Ledger.balance_points
+        :param start: Day ordinal
+        :param end: Day ordinal, exclusive
+        """
+        start = 0 if start is None else start
+        end = LAST_DAY if end is None else end
+        return self.window(start, end).balance_points(start, end)
+
+    def range_totals(self, start: int, end: int) -> tuple:
+        """
+        (opening balance, credits, debits, closing balance) in cents of [start, end)
+        :param start: Day ordinal
+        :param end: Day ordinal, exclusive
+        """
+        opening = self.storage.query_one(LAST_ROW_BEFORE, (self.account, start)) or (0,) * 6
+        closing = self.storage.query_one(LAST_ROW_BEFORE, (self.account, end)) or (0,) * 6
+        credits = closing[5] - opening[5]
+        return opening[4], credits, credits - (closing[4] - opening[4]), closing[4]
+
+    balance_on = Ledger.balance_on
+    balance_segments = Ledger.balance_segments
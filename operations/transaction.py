@@ -1,37 +1,74 @@
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime
 
 from logger import logger
 from messages import TRANSACTION
-from utils import validate_time_format
-from constants import W_TRANSACTION_LIMIT
+from utils import validate_time_format, to_cents, from_cents
+from instrumentation import instrumented
+from constants import W_TRANSACTION_LIMIT, MAX_CENTS
+from operations.storage import MemoryStorage
+from operations.interest_engine import InterestAccrual
+
+MAX_AMOUNT = f'{MAX_CENTS // 100}.{MAX_CENTS % 100:02d}'
 
 
 class Transaction:
 
     def __init__(self):
-        self.balance_by_day = {}
         self.accounts = {}
         self.txn_no_id = {}
+        self.storage = MemoryStorage()
+        self.quiet = False  # Skip echoing the account statement after every transaction
+        self.book_lock = threading.RLock()  # Guards state shared by all accounts when called from threads
 
+    @instrumented('handle_transaction')
     def handle_transaction(self, transaction_items: str) -> float:
         """
         Validate and add transaction
         :param transaction_items
         """
+        date, account, txn_type, amount = self.parse_transaction(transaction_items)
+        self.apply_transaction(date, account, txn_type, amount)
+        if not self.quiet:
+            self.print_account_statement(account)
+        return self.accounts[account]["balance"]
+
+    @staticmethod
+    @instrumented('parse_transaction')
+    def parse_transaction(transaction_items: str) -> tuple:
+        """
+        Parse input transaction into its typed values
+        :param transaction_items: <Date> <Account> <Type> <Amount>
+        :return: date, account, txn_type, amount in cents
+        """
         transaction_items = transaction_items.strip().split()
         if len(transaction_items) != 4:
             raise Exception('Transaction values are not in correct format.')
         date, account, txn_type, amount = transaction_items
         txn_type = txn_type.lower()
-        amount = float(amount)
+        amount = to_cents(amount)
         date = validate_time_format(date)
-        self.validate_transaction_type(txn_type)
+        Transaction.validate_transaction_type(txn_type)
+        return date, account, txn_type, amount
+
+    def apply_transaction(self, date: datetime, account: str, txn_type: str, amount: int) -> None:
+        """
+        Validate a parsed transaction against the account and add it, without printing the statement
+        :param date
+        :param account
+        :param txn_type
+        :param amount: In cents
+        """
         self.validate_transaction_amount(account, amount, txn_type)
         self.validate_transaction_limit(account, amount, txn_type, date)
-        self.txn_no_id[date] = self.txn_no_id[date] + 1 if self.txn_no_id.get(date) else 1
-        self.add_transaction(date, account, txn_type, amount)
-        self.print_account_statement(account)
-        return self.accounts[account]["balance"]
+        with self.book_lock:  # Snapshots and rule changes iterate the accounts under it
+            self.open_account(account)
+            self.txn_no_id[date] = self.txn_no_id[date] + 1 if self.txn_no_id.get(date) else 1
+            try:
+                self.add_transaction(date, account, txn_type, amount)
+            except Exception:
+                self.txn_no_id[date] -= 1  # The transaction was not added
+                raise
 
     @staticmethod
     def validate_transaction_type(txn_type: str) -> None:
@@ -42,110 +79,124 @@ class Transaction:
         if txn_type not in ['d', 'w']:
             raise Exception('Transaction type can only either be w or d.')
 
-    def validate_transaction_limit(self, account: str, amount: float, txn_type: str,
+    @instrumented('validate_transaction_limit')
+    def validate_transaction_limit(self, account: str, amount: int, txn_type: str,
                                    date: datetime) -> None:
         """
         Validate transaction amount against a few conditions
         :param account
-        :param amount
+        :param amount: In cents
         :param txn_type
         :param date
         """
         if txn_type != "w":
             return
-        transactions = self.accounts[account].get('transactions')
-        total_txt_amount = amount
-        for txn in transactions:
-            if txn['type'].lower() == 'w' and  txn['date'].date() == date.date():
-                total_txt_amount += txn['amount']
-        if total_txt_amount > W_TRANSACTION_LIMIT:
+        total_txt_amount = amount + self.get_daily_withdrawals(account, date)["amount"]
+        if total_txt_amount > W_TRANSACTION_LIMIT * 100:
             raise Exception('Transaction limit exceeded')
 
-    def validate_transaction_amount(self, account: str, amount: float, txn_type: str) -> None:
+    @instrumented('validate_transaction_amount')
+    def validate_transaction_amount(self, account: str, amount: int, txn_type: str) -> None:
         """
         Validate transaction amount against a few conditions
         :param account
-        :param amount
+        :param amount: In cents
         :param txn_type
         """
         if amount <= 0:
             raise Exception('Amount must be greater than 0.')
-        if round(amount, 2) != amount:
-            raise Exception('Amount must be at most 2 decimal places.')
+        if amount > MAX_CENTS:
+            raise Exception(f'Amount must be at most {MAX_AMOUNT}.')
+        if txn_type == "d" and self.accounts.get(account, {}).get('balance_cents', 0) + amount > MAX_CENTS:
+            raise Exception(f'Balance can be at most {MAX_AMOUNT}.')
         if txn_type == "w":
             if account not in self.accounts:
                 raise Exception('Provided account does not exist.')
-            if self.accounts.get(account, {}).get('balance') < amount:
+            if self.accounts.get(account, {}).get('balance_cents') < amount:
                 raise Exception('Insufficient balance.')
+
+    def open_account(self, account: str) -> None:
+        """
+        Create the account if it does not exist yet
+        :param account
+        """
         if account not in self.accounts:
-            self.accounts[account] = {"balance": 0.0, "transactions": []}
+            self.accounts[account] = {"balance": 0.0, "balance_cents": 0,
+                                      "transactions": self.storage.new_ledger(account),
+                                      "withdrawals_by_day": {}, "accrual": InterestAccrual()}
+
+    def open_storage(self, storage) -> None:
+        """
+        Keep ledgers in storage from now on, loading the accounts it already holds
+        :param storage: MemoryStorage or SqliteStorage
+        """
+        self.storage = storage
+        self.txn_no_id.update((datetime.fromordinal(day), seq) for day, seq in storage.load_sequences().items())
+        for account, ledger, last_day, balance in storage.load_accounts():
+            accrual = InterestAccrual()
+            accrual.day, accrual.balance = last_day, balance
+            if self.interest_rules:
+                accrual.reaccrue(ledger.first_day, ledger, self.rate_timeline)
+            self.accounts[account] = {"balance": from_cents(balance), "balance_cents": balance, "transactions": ledger,
+                                      "withdrawals_by_day": {}, "accrual": accrual}
+
+    def close_storage(self) -> None:
+        """Write buffered rows and release the storage"""
+        self.storage.close()
+
+    def get_daily_withdrawals(self, account: str, date: datetime) -> dict:
+        """
+        Total amount in cents and count of withdrawals made by an account on a day
+        :param account
+        :param date
+        """
+        return self.storage.daily_withdrawals(account, self.accounts[account], date.date())
 
+    @instrumented('print_account_statement')
     def print_account_statement(self, account: str) -> None:
         """
         Print account statement
         :param account
         """
         find_space = lambda value: 20 - len(str(value))
-        logger.info(TRANSACTION.format(
+        lines = [TRANSACTION.format(
             'Date' + ' ' * find_space('Date'),
             'Txn Id' + ' ' * find_space('Txn Id'),
             'Type' + ' ' * find_space('Type'),
             'Amount' + ' ' * find_space('Amount'),
-        ))
+        )]
         for txn in self.accounts[account]["transactions"]:
             date, txn_id, txn_type, amount = txn['date'], str(txn['id']), str(txn['type']), str(txn['amount'])
             date = date.strftime("%Y%m%d")
-            logger.info(TRANSACTION.format(
+            lines.append(TRANSACTION.format(
                 date + ' ' * find_space(date),
                 txn_id + ' ' * find_space(txn_id),
                 txn_type + ' ' * find_space(txn_type),
                 amount + ' ' * find_space(amount),
             ))
+        logger.info('\n'.join(lines))
 
-    def add_transaction(self, txn_date: datetime, account: str, txn_type: str, amount: float) -> None:
+    @instrumented('add_transaction')
+    def add_transaction(self, txn_date: datetime, account: str, txn_type: str, amount: int) -> None:
         """
         Adds a transaction for the specified account.
         :param txn_date
         :param account
         :param txn_type
-        :param amount
+        :param amount: In cents
         """
-        transaction_id = self.generate_transaction_id(txn_date)
+        # Same day transactions are ordered by their sequence number, the <n> of the <YYYYMMDD>-<n> id.
+        # The ledger goes first, it rejects amounts it cannot hold before anything else changes.
+        self.accounts[account]["transactions"].insert(
+            txn_date.toordinal(), self.txn_no_id[txn_date], txn_type.upper(), amount)
         if txn_type == "w":
-            self.accounts[account]["balance"] -= amount
+            self.accounts[account]["balance_cents"] -= amount
+            self.storage.record_withdrawal(self.accounts[account], txn_date.date(), amount)
         else:
-            self.accounts[account]["balance"] += amount
-        self.update_missing_days_balance(txn_date, account)
-        # Adding time to date to be able to sort transactions of a same day based on time
-        current_time = datetime.now().time()
-        txn_date= txn_date.replace(hour=current_time.hour, minute=current_time.minute, second=current_time.second,
-                                   microsecond=current_time.microsecond)
-        self.accounts[account]["transactions"].append({
-            "date": txn_date,
-            "id": transaction_id,
-            "type": txn_type.upper(),
-            "amount": amount,
-            "current_balance": self.accounts[account]["balance"]
-        })
-        self.balance_by_day[txn_date.date()] = self.accounts[account]["balance"]
-
-    def generate_transaction_id(self, date: datetime):
-        """
-        Generates a unique transaction ID based on the date.
-        :param date
-        """
-        return f"{date.strftime('%Y%m%d')}-{self.txn_no_id[date]}"
-
-    def update_missing_days_balance(self, txn_date: datetime, account: str):
-        """
-        Update balance of days that had no transaction with last day's balance
-        :param txn_date:
-        :param account:
-        :return:
-        """
-        prev_txn = self.accounts[account]["transactions"][-1] if self.accounts[account]["transactions"] else {}
-        if prev_txn and (txn_date.date() - prev_txn['date'].date()).days + 1 > 0:  # Updating balance of missed days
-            prev_date = prev_txn['date'] + timedelta(days=1)
-            while prev_date < txn_date:
-                self.balance_by_day[prev_date.date()] = prev_txn['current_balance']
-                prev_date += timedelta(days=1)
+            self.accounts[account]["balance_cents"] += amount
+        # Balances are kept in cents, the float balance is only a view of it
+        self.accounts[account]["balance"] = from_cents(self.accounts[account]["balance_cents"])
+        self.accounts[account]["accrual"].post(txn_date.toordinal(), -amount if txn_type == "w" else amount,
+                                               self.rate_timeline)
+        self.statement_cache.invalidate_account(account, (txn_date.year, txn_date.month))
+        self.journal_transaction(txn_date, account, txn_type, amount)
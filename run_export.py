@@ -0,0 +1,33 @@
+import argparse
+from datetime import datetime
+
+from main import BankSystem
+from logger import flush_logger
+from constants import EXPORT_FORMATS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Export every account statement of a month')
+    parser.add_argument('month', type=lambda value: datetime.strptime(value, '%Y%m'), help='<Year><Month>')
+    parser.add_argument('-o', '--output', default='-', help='File to write, "-" for stdout')
+    parser.add_argument('-f', '--format', choices=EXPORT_FORMATS, default='csv')
+    parser.add_argument('-a', '--accounts', help='Only export accounts matching this pattern, e.g. "AC0*"')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Processes rendering statements')
+    parser.add_argument('-d', '--data-dir', help='Directory to recover state from, it is only read')
+    parser.add_argument('-r', '--rules', help='File of <Date> <RuleId> <Rate in %%> rows to load first')
+    parser.add_argument('-t', '--transactions', help='File of <Date> <Account> <Type> <Amount> rows to load first')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    bank_system = BankSystem()
+    bank_system.quiet = True
+    if args.data_dir:
+        bank_system.recover_journal(args.data_dir)  # Rows loaded below are not journaled into it
+    if args.rules:
+        bank_system.ingest_interest_rules(args.rules)
+    if args.transactions:
+        bank_system.ingest_transactions(args.transactions)
+    bank_system.export_statements(args.month, args.output, args.format, args.accounts, args.workers)
+    flush_logger()
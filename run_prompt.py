@@ -1,6 +1,35 @@
+import argparse
+
 from main import BankSystem
+from operations.storage import SqliteStorage
+from constants import INGEST_CHUNK_SIZE
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='AwesomeGIC Bank interest calculator')
+    parser.add_argument('-r', '--rules', help='File of <Date> <RuleId> <Rate in %%> rows to load, "-" for stdin')
+    parser.add_argument('-t', '--transactions',
+                        help='File of <Date> <Account> <Type> <Amount> rows to load, "-" for stdin')
+    parser.add_argument('-d', '--data-dir', help='Directory to recover state from and journal changes to')
+    parser.add_argument('--sqlite', help='Keep transactions in this SQLite database instead of memory')
+    parser.add_argument('--chunk-size', type=int, default=INGEST_CHUNK_SIZE, help='Rows parsed per chunk')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='Do not print the account statement after every transaction')
+    parser.add_argument('-s', '--stats', action='store_true', help='Time operations from the start, see [S]')
+    parser.add_argument('-i', '--interactive', action='store_true', help='Open the prompt after loading files')
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    bank_system = BankSystem()
-    bank_system.run_operations()
+    args = parse_args()
+    bank_system = BankSystem(args.data_dir, SqliteStorage(args.sqlite) if args.sqlite else None)
+    bank_system.quiet = args.quiet
+    bank_system.enable_stats(args.stats)
+    if args.rules:
+        bank_system.ingest_interest_rules(args.rules, args.chunk_size)
+    if args.transactions:
+        bank_system.ingest_transactions(args.transactions, args.chunk_size)
+    if args.interactive or not (args.rules or args.transactions):
+        bank_system.run_operations()
+    bank_system.close_journal()
+    bank_system.close_storage()
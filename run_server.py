@@ -0,0 +1,30 @@
+import argparse
+import asyncio
+
+from main import BankSystem
+from operations.storage import SqliteStorage
+from server import BankServer
+from constants import SERVER_WORKERS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='AwesomeGIC Bank interest calculator server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='Listen on this Unix socket path instead of TCP')
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS, help='Threads running operations')
+    parser.add_argument('-d', '--data-dir', help='Directory to recover state from and journal changes to')
+    parser.add_argument('--sqlite', help='Keep transactions in this SQLite database instead of memory')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    bank_system = BankSystem(args.data_dir, SqliteStorage(args.sqlite) if args.sqlite else None)
+    try:
+        asyncio.run(BankServer(bank_system, args.workers).serve_forever(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bank_system.close_journal()
+        bank_system.close_storage()
@@ -0,0 +1,154 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from logger import logger
+from messages import SERVER_LISTENING
+from constants import SERVER_WORKERS
+
+
+class ReadWriteGate:
+    """
+    Asyncio lock letting any number of account operations run together while a rule change
+    waits for them to finish and runs alone. Waiting rule changes go before new account operations.
+    """
+
+    def __init__(self):
+        self.condition = asyncio.Condition()
+        self.readers = 0
+        self.writing = False
+        self.writers_waiting = 0
+
+    @asynccontextmanager
+    async def shared(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: not self.writing and not self.writers_waiting)
+            self.readers += 1
+        try:
+            yield
+        finally:
+            async with self.condition:
+                self.readers -= 1
+                self.condition.notify_all()
+
+    @asynccontextmanager
+    async def exclusive(self):
+        async with self.condition:
+            self.writers_waiting += 1
+            await self.condition.wait_for(lambda: not self.writing and not self.readers)
+            self.writers_waiting -= 1
+            self.writing = True
+        try:
+            yield
+        finally:
+            async with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+
+class BankServer:
+    """
+    Serve the T/I/P commands of the prompt to many clients over TCP or a Unix socket.
+    Every request is one line, e.g. "T 20230626 AC001 d 1231", "I 20230615 RULE05 2.21" or
+    "P AC001 202306" (or "P AC001 202301 202306", "P AC001 YTD 202306" for a monthly summary),
+    answered with result lines followed by an empty line.
+    Operations run in a thread pool: one account's operations are serialized by its own lock,
+    different accounts run side by side and interest rule changes run alone, in arrival order.
+    """
+
+    def __init__(self, bank_system, workers: int = SERVER_WORKERS):
+        self.bank_system = bank_system
+        self.bank_system.quiet = True
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.account_locks = {}  # Account: [lock, requests holding or waiting for it]
+        self.rules_gate = ReadWriteGate()
+
+    @asynccontextmanager
+    async def account_lock(self, account: str):
+        """
+        Serialize the operations of one account. The lock is dropped once no request holds or
+        waits for it, so accounts named by clients do not pile up locks.
+        :param account
+        """
+        entry = self.account_locks.setdefault(account, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self.account_locks[account]
+
+    async def run(self, operation, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, operation, *args)
+
+    async def execute(self, request: str) -> list:
+        """
+        Run one request and return its response lines
+        :param request: <Command> <Arguments>
+        """
+        command, _, arguments = request.strip().partition(' ')
+        command = command.lower()
+        bank_system = self.bank_system
+        if command == 't':
+            date, account, txn_type, amount = bank_system.parse_transaction(arguments)
+            async with self.rules_gate.shared(), self.account_lock(account):
+                await self.run(bank_system.apply_transaction, date, account, txn_type, amount)
+                return [f'OK {bank_system.accounts[account]["balance"]}']
+        if command == 'i':
+            date, rate, rule_id = bank_system.validate_new_interest_rule(arguments)
+            async with self.rules_gate.exclusive():
+                await self.run(bank_system.add_interest_rule, date, rate, rule_id)
+                return bank_system.format_interest_rules()
+        if command == 'p':
+            account = arguments.split()[0] if arguments.split() else ''
+            async with self.rules_gate.shared(), self.account_lock(account):
+                if len(arguments.split()) == 3:
+                    statement = await self.run(bank_system.get_range_statement, arguments)
+                    return bank_system.format_range_statement(statement)
+                _, lines = await self.run(bank_system.get_statement, arguments)
+                return lines
+        if command == 's':
+            async with self.rules_gate.exclusive():  # No operation changes the book while it is counted
+                return [json.dumps(await self.run(bank_system.get_stats))]
+        raise Exception('Command must be one of T, I, P, S or Q.')
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while request := await reader.readline():
+                if request.strip().lower() == b'q':
+                    break
+                if not request.strip():
+                    continue
+                try:
+                    lines = await self.execute(request.decode())
+                except Exception as err:
+                    lines = [f'ERROR {err}']
+                writer.write(('\n'.join(lines) + '\n\n').encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0, path: str = None) -> asyncio.AbstractServer:
+        """
+        Start listening on a Unix socket when path is given, otherwise on host and port
+        :param host
+        :param port: 0 picks a free port
+        :param path
+        """
+        if path:
+            server = await asyncio.start_unix_server(self.handle_client, path=path)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+        for socket in server.sockets:
+            logger.info(SERVER_LISTENING.format(socket.getsockname()))
+        return server
+
+    async def serve_forever(self, host: str = '127.0.0.1', port: int = 0, path: str = None) -> None:
+        server = await self.start(host, port, path)
+        async with server:
+            await server.serve_forever()
@@ -1,7 +1,17 @@
+import asyncio
+import json
 import logging
+import os
+import threading
+from datetime import datetime
 
 import pytest
 from main import BankSystem
+from operations.statement_cache import StatementCache
+from operations.storage import SqliteStorage
+from operations.interest_engine import RateTimeline, ledger_month_interest
+from instrumentation import stats
+from server import BankServer
 
 
 @pytest.fixture
@@ -84,3 +94,515 @@ def test_complete_flow_two(bank_system):
         bank_system.define_interest_rule(rule)
     interest = bank_system.handle_show_transaction_and_interest('AC001 202401')
     assert round(interest, 2) == 2.93
+
+
+def test_ingest_transactions(bank_system, tmp_path):
+    rows = tmp_path / 'transactions.csv'
+    rows.write_text('Date,Account,Type,Amount\n'
+                    '20240101,AC001,d,1000.00\n'
+                    '\n'
+                    '20240102,AC001,w,5000.00\n'
+                    '20240103 AC001 x 10\n'
+                    '20240110,AC001,w,200.00\n')
+    assert bank_system.ingest_transactions(str(rows), chunk_size=2) == {"accepted": 2, "rejected": 2}
+    assert bank_system.accounts["AC001"]["balance"] == 800.0
+    assert len(bank_system.accounts["AC001"]["transactions"]) == 2
+
+
+def test_ingest_interest_rules(bank_system, caplog):
+    with caplog.at_level(logging.ERROR, logger="MyLogger"):
+        result = bank_system.ingest_interest_rules(['20240105 RULE01 2.00', '20240115 RULE02 300',
+                                                    '20240101 RULE00 1.00'])
+    assert result == {"accepted": 2, "rejected": 1}
+    assert [rule["rule_id"] for rule in bank_system.interest_rules] == ["RULE00", "RULE01"]
+    assert 'Line 2: Interest rate must be greater than 0 and less than 100.' in caplog.text
+
+
+def test_daily_withdrawals_index(bank_system):
+    bank_system.handle_transaction("20240101 AC001 d 5000")
+    bank_system.handle_transaction("20240101 AC001 w 1000")
+    bank_system.handle_transaction("20240102 AC001 w 2500")
+    bank_system.handle_transaction("20240101 AC001 w 500.50")
+    assert bank_system.get_daily_withdrawals("AC001", datetime(2024, 1, 1)) == {"amount": 150050, "count": 2}
+    assert bank_system.get_daily_withdrawals("AC001", datetime(2024, 1, 2)) == {"amount": 250000, "count": 1}
+    assert bank_system.get_daily_withdrawals("AC001", datetime(2024, 1, 3)) == {"amount": 0, "count": 0}
+    with pytest.raises(Exception, match="Transaction limit exceeded"):
+        bank_system.handle_transaction("20240102 AC001 w 500.01")
+    bank_system.handle_transaction("20240102 AC001 w 500")
+
+
+def test_fixed_point_amounts(bank_system):
+    for _ in range(10):
+        bank_system.handle_transaction("20240101 AC001 d 0.1")
+    bank_system.handle_transaction("20240101 AC001 d 0.2")
+    assert bank_system.accounts["AC001"]["balance_cents"] == 120
+    assert bank_system.accounts["AC001"]["balance"] == 1.2
+    bank_system.handle_transaction("20240101 AC001 w 1.2")
+    assert bank_system.accounts["AC001"]["balance"] == 0
+    with pytest.raises(Exception, match="at most 4 decimal places"):
+        bank_system.define_interest_rule("20240101 RULE01 1.23456")
+    bank_system.define_interest_rule("20240101 RULE01 1.2345")
+    assert bank_system.interest_rules[0]["rate_units"] == 12345
+
+
+def test_amounts_beyond_int64_cents_are_rejected_whole(bank_system):
+    with pytest.raises(Exception, match="Amount must be at most 92233720368547758.07."):
+        bank_system.handle_transaction("20240102 AC1 d 100000000000000000")
+    with pytest.raises(Exception, match="Amount must be at most"):
+        bank_system.handle_transaction("20240102 AC1 d 1e30")
+    assert "AC1" not in bank_system.accounts
+    bank_system.handle_transaction("20240102 AC2 d 92233720368547748.07")
+    with pytest.raises(Exception, match="Balance can be at most 92233720368547758.07."):
+        bank_system.handle_transaction("20240102 AC2 d 10.01")
+    bank_system.handle_transaction("20240102 AC2 w 10.00")
+    with pytest.raises(Exception, match="Amount is too large for the account."):
+        bank_system.handle_transaction("20240102 AC2 d 10.01")  # Running deposits pass int64
+    ledger = bank_system.accounts["AC2"]["transactions"]
+    assert {len(getattr(ledger, name)) for name in ledger.columns} == {2}
+    assert bank_system.accounts["AC2"]["balance_cents"] == 2 ** 63 - 1 - 2000
+    assert bank_system.txn_no_id[datetime(2024, 1, 2)] == 2
+
+
+@pytest.mark.parametrize("interest_method", ["interval", "daily"])
+@pytest.mark.parametrize("rules, expected", [
+    (['20240105 RULE01 2.00', '20240115 RULE02 3.00'], 2.1),
+    (['20240101 RULE01 2.00', '20240103 RULE01 4.00', '20240115 RULE02 3.00'], 2.93),
+])
+def test_interest_methods(bank_system, interest_method, rules, expected):
+    bank_system.interest_method = interest_method
+    for txn in ['20240101 AC001 d 1000.00', '20240110 AC001 w 200.00', '20240120 AC001 d 500.00']:
+        bank_system.handle_transaction(txn)
+    for rule in rules:
+        bank_system.define_interest_rule(rule)
+    assert bank_system.handle_show_transaction_and_interest('AC001 202401') == expected
+
+
+def test_interval_interest_carries_balance_into_quiet_months(bank_system):
+    bank_system.define_interest_rule("20231201 RULE01 3.65")
+    bank_system.handle_transaction("20231215 AC001 d 1000")
+    bank_system.handle_transaction("20231220 AC002 d 5000")
+    assert bank_system.calculate_monthly_interest(datetime(2024, 2, 1), "AC001") == 2.9
+    bank_system.interest_method = "unknown"
+    with pytest.raises(Exception, match="Interest method must be one of interval, daily."):
+        bank_system.calculate_monthly_interest(datetime(2024, 2, 1), "AC001")
+
+
+def test_accrual_follows_backdated_events(bank_system):
+    bank_system.define_interest_rule("20240101 RULE01 2.00")
+    for txn in ['20240110 AC001 d 1000.00', '20240305 AC001 w 300.00', '20240120 AC001 d 50.00',
+                '20231215 AC001 d 10.00', '20240305 AC002 d 99.99']:
+        bank_system.handle_transaction(txn)
+    for rule in ['20240201 RULE02 3.10', '20231201 RULE00 1.25', '20240115 RULE03 2.75']:
+        bank_system.define_interest_rule(rule)
+    bank_system.handle_transaction('20240214 AC001 w 25.00')
+    timeline = RateTimeline(bank_system.interest_rules)
+    for account in ["AC001", "AC002"]:
+        for month in [datetime(2023, 12, 1), datetime(2024, 1, 1), datetime(2024, 2, 1), datetime(2024, 3, 1),
+                      datetime(2024, 6, 1)]:
+            expected = ledger_month_interest(bank_system.accounts[account]["transactions"], timeline, month)
+            assert bank_system.calculate_interval_interest(month, account) == expected
+
+
+def test_balance_history_change_points(bank_system):
+    bank_system.define_interest_rule("20230101 RULE01 3.65")
+    bank_system.handle_transaction("20230105 AC001 d 100")
+    bank_system.handle_transaction("20240105 AC001 d 50")
+    bank_system.handle_transaction("20240110 AC002 d 1000")
+    ledger = bank_system.accounts["AC001"]["transactions"]
+    assert ledger.balance_points() == [(datetime(2023, 1, 5).toordinal(), 10000),
+                                       (datetime(2024, 1, 5).toordinal(), 15000)]
+    assert ledger.balance_on(datetime(2023, 7, 1).toordinal()) == 10000
+    start, end = datetime(2024, 1, 1).toordinal(), datetime(2024, 2, 1).toordinal()
+    assert ledger.balance_segments(start, end) == [(start, start + 4, 10000), (start + 4, end, 15000)]
+    bank_system.interest_method = "daily"
+    assert bank_system.calculate_monthly_interest(datetime(2023, 6, 1), "AC001") == 0.3
+    assert bank_system.calculate_monthly_interest(datetime(2024, 1, 1), "AC001") == 0.44
+
+
+def test_range_statement(bank_system):
+    bank_system.define_interest_rule("20231201 RULE01 3.65")
+    for txn in ['20231215 AC001 d 1000.00', '20240110 AC001 w 200.00', '20240120 AC001 d 500.00']:
+        bank_system.handle_transaction(txn)
+    statement = bank_system.handle_show_range_statement("AC001 202312 202402")
+    assert [row["month"] for row in statement["months"]] == ["202312", "202401", "202402"]
+    assert [(row["opening_balance"], row["credits"], row["debits"], row["closing_balance"])
+            for row in statement["months"]] == [(0.0, 1000.0, 0.0, 1000.0), (1000.0, 500.0, 200.0, 1300.0),
+                                                (1300.0, 0.0, 0.0, 1300.0)]
+    assert [row["interest"] for row in statement["months"]] == [
+        bank_system.calculate_monthly_interest(datetime(2024, month, 1) if month < 12 else datetime(2023, 12, 1),
+                                               "AC001") for month in (12, 1, 2)]
+    assert statement["interest"] == round(sum(row["interest"] for row in statement["months"]), 2)
+    assert (statement["opening_balance"], statement["credits"], statement["debits"],
+            statement["closing_balance"]) == (0.0, 1500.0, 200.0, 1300.0)
+    ytd = bank_system.get_range_statement("AC001 YTD 202402")
+    assert ytd["months"] == statement["months"][1:]
+    with pytest.raises(Exception, match="Statement range must not end before it starts."):
+        bank_system.get_range_statement("AC001 202402 202401")
+    with pytest.raises(Exception, match="Provided account does not exist."):
+        bank_system.get_range_statement("AC002 YTD 202402")
+
+
+def test_eom_interest_matches_statements(bank_system):
+    for rule in ['20231220 RULE01 1.50', '20240105 RULE02 2.00', '20240115 RULE03 3.25']:
+        bank_system.define_interest_rule(rule)
+    for txn in ['20231201 AC001 d 1000.00', '20240110 AC001 w 200.00', '20240120 AC001 d 500.00',
+                '20240103 AC002 d 250.55', '20240131 AC002 d 100.00', '20240201 AC003 d 80.00']:
+        bank_system.handle_transaction(txn)
+    year_month = datetime(2024, 1, 1)
+    interests = bank_system.calculate_eom_interest(year_month)
+    assert interests == {account: bank_system.calculate_monthly_interest(year_month, account)
+                         for account in ["AC001", "AC002", "AC003"]}
+    assert interests["AC003"] == 0.0
+    bank_system.calculate_eom_interest(year_month, post=True)
+    assert bank_system.accounts["AC001"]["transactions"][-1]["type"] == "I"
+    assert bank_system.accounts["AC001"]["balance"] == 1300.0 + interests["AC001"]
+    with pytest.raises(Exception, match="Interest is already posted for this month."):
+        bank_system.calculate_eom_interest(year_month, post=True)
+
+
+def test_posting_leaves_month_interest_unchanged(bank_system):
+    bank_system.define_interest_rule("20240101 RULE01 5")
+    bank_system.handle_transaction("20240101 AC1 d 100000")
+    year_month = datetime(2024, 1, 1)
+    before = (bank_system.calculate_eom_interest(year_month), bank_system.run_month_end(year_month, workers=1),
+              bank_system.get_statement("AC1 202401"), bank_system.get_range_statement("AC1 202401 202401"))
+    assert before[0] == {"AC1": 424.66}
+    bank_system.calculate_eom_interest(year_month, post=True)
+    after = (bank_system.calculate_eom_interest(year_month), bank_system.run_month_end(year_month, workers=1),
+             bank_system.get_statement("AC1 202401"), bank_system.get_range_statement("AC1 202401 202401"))
+    assert after == before
+    assert [line.split("|")[3].strip() for line in before[2][1]] == ["Type", "D", "I"]
+    february = bank_system.filter_current_month_transactions(datetime(2024, 2, 1), "AC1")
+    assert [(row["date"], row["type"], row["amount"]) for row in february] == [(datetime(2024, 2, 1), "I", 424.66)]
+
+
+def test_rate_scenarios_leave_live_rules_untouched(bank_system):
+    bank_system.define_interest_rule("20231220 RULE01 1.50")
+    for txn in ['20231201 AC001 d 1000.00', '20240110 AC001 w 200.00', '20240103 AC002 d 250.55']:
+        bank_system.handle_transaction(txn)
+    scenarios = {"live": [], "hike": ["20240115 RULE02 3.25"], "cut": ["20231220 RULE01 0.50", "20240120 RULE03 1"]}
+    year_month = datetime(2024, 1, 1)
+    result = bank_system.evaluate_rate_scenarios(year_month, scenarios)
+    assert [rule["rule_id"] for rule in bank_system.interest_rules] == ["RULE01"]
+    assert result["accounts"]["AC001"]["live"] == bank_system.calculate_monthly_interest(year_month, "AC001")
+    for name, rules in scenarios.items():
+        what_if = BankSystem()
+        what_if.quiet = True
+        for rule in ['20231220 RULE01 1.50'] + rules:
+            what_if.define_interest_rule(rule)
+        for txn in ['20231201 AC001 d 1000.00', '20240110 AC001 w 200.00', '20240103 AC002 d 250.55']:
+            what_if.handle_transaction(txn)
+        expected = what_if.calculate_eom_interest(year_month)
+        assert {account: interests[name] for account, interests in result["accounts"].items()} == expected
+        assert result["totals"][name] == round(sum(expected.values()), 2)
+    only_candidates = bank_system.evaluate_rate_scenarios(year_month, {"new": ["20240120 RULE09 2"]}, False)
+    assert only_candidates["accounts"]["AC002"]["new"] < result["accounts"]["AC002"]["live"]
+
+
+def test_month_rows_in_date_order(bank_system):
+    for txn in ['20240201 AC001 d 100.00', '20240301 AC001 d 50.00', '20240115 AC001 d 10.00',
+                '20240201 AC001 w 20.00', '20240131 AC001 d 1.00']:
+        bank_system.handle_transaction(txn)
+    ledger = bank_system.accounts["AC001"]["transactions"]
+    assert [row["id"] for row in ledger] == ['20240115-1', '20240131-1', '20240201-1', '20240201-2', '20240301-1']
+    assert [row["current_balance"] for row in ledger] == [10.0, 11.0, 111.0, 91.0, 141.0]
+    february = bank_system.filter_current_month_transactions(datetime(2024, 2, 1), "AC001")
+    assert [(row["type"], row["amount"]) for row in february] == [('D', 100.0), ('W', 20.0)]
+    assert bank_system.filter_current_month_transactions(datetime(2024, 4, 1), "AC001") == []
+    with pytest.raises(TypeError):
+        february[0]["amount"] = 0
+
+
+def test_statement_cache_invalidation(bank_system):
+    bank_system.define_interest_rule("20240101 RULE01 3.65")
+    for txn in ['20240101 AC001 d 1000.00', '20240101 AC002 d 1000.00']:
+        bank_system.handle_transaction(txn)
+    for statement in ['AC001 202401', 'AC001 202402', 'AC001 202403', 'AC002 202401', 'AC001 202401']:
+        bank_system.handle_show_transaction_and_interest(statement)
+    cache = bank_system.statement_cache
+    assert (cache.stats()["hits"], cache.stats()["misses"], cache.stats()["size"]) == (1, 4, 4)
+    bank_system.handle_transaction("20240215 AC001 d 1000.00")
+    assert sorted(cache.entries) == [("AC001", (2024, 1)), ("AC002", (2024, 1))]
+    assert bank_system.handle_show_transaction_and_interest('AC001 202402') == 4.4
+    bank_system.define_interest_rule("20240301 RULE02 7.30")
+    assert sorted(cache.entries) == [("AC001", (2024, 1)), ("AC001", (2024, 2)), ("AC002", (2024, 1))]
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_statement_cache_eviction():
+    bank_system = BankSystem()
+    bank_system.statement_cache = StatementCache(max_size=2)
+    bank_system.handle_transaction("20240101 AC001 d 1000.00")
+    for month in ['202401', '202402', '202401', '202403']:
+        bank_system.calculate_monthly_interest(datetime.strptime(month, "%Y%m"), "AC001")
+    assert sorted(bank_system.statement_cache.entries) == [("AC001", (2024, 1)), ("AC001", (2024, 3))]
+    assert bank_system.statement_cache.stats()["evictions"] == 1
+
+
+def test_run_month_end_matches_statements(bank_system, caplog):
+    for rule in ['20231220 RULE01 1.50', '20240115 RULE02 3.25']:
+        bank_system.define_interest_rule(rule)
+    for index in range(12):
+        bank_system.handle_transaction(f"202312{index + 1:02d} AC{index:03d} d {100 * (index + 1)}.55")
+        bank_system.handle_transaction(f"202401{index + 10:02d} AC{index:03d} w {10 * (index + 1)}")
+    bank_system.handle_transaction("20240205 AC001 d 10")
+    year_month = datetime(2024, 1, 1)
+    single = bank_system.run_month_end(year_month, workers=1)
+    assert list(single) == sorted(bank_system.accounts)
+    try:
+        assert bank_system.run_month_end(year_month, workers=3) == single
+        assert bank_system.eom_pool_workers == 3
+        assert bank_system.run_month_end(year_month, workers=3) == single
+    finally:
+        bank_system.close_eom_pool()
+    for account, result in single.items():
+        caplog.clear()
+        with caplog.at_level(logging.INFO, logger="MyLogger"):
+            assert bank_system.handle_show_transaction_and_interest(f"{account} 202401") == result["interest"]
+        assert caplog.messages == ["\n".join(result["lines"])]
+
+
+def test_export_statements(bank_system, tmp_path):
+    bank_system.define_interest_rule("20231220 RULE01 1.50")
+    for index in range(5):
+        bank_system.handle_transaction(f"202312{index + 1:02d} AC{index:03d} d {100 * (index + 1)}.55")
+        bank_system.handle_transaction(f"202401{index + 10:02d} AC{index:03d} w {10 * (index + 1)}")
+    bank_system.handle_transaction("20240105 BC001 d 10")
+    year_month = datetime(2024, 1, 1)
+    csv_path, jsonl_path = tmp_path / 'statements.csv', tmp_path / 'statements.jsonl'
+    assert bank_system.export_statements(year_month, str(csv_path), account_filter="AC*") == 10
+    lines = csv_path.read_text().splitlines()
+    assert lines[:3] == ["account,date,txn_id,type,amount,balance", "AC000,20240110,20240110-1,W,10.0,90.55",
+                         f"AC000,20240131,,I,{bank_system.calculate_monthly_interest(year_month, 'AC000')},"
+                         f"{90.55 + bank_system.calculate_monthly_interest(year_month, 'AC000')}"]
+    assert bank_system.export_statements(year_month, str(jsonl_path), 'jsonl', workers=2) == 12
+    rows = [json.loads(line) for line in jsonl_path.read_text().splitlines()]
+    assert [row["account"] for row in rows][-2:] == ["BC001", "BC001"]
+    assert list(bank_system.iter_statement_rows(year_month, workers=3, chunk_size=2)) == [
+        tuple(row.values()) for row in rows]
+    with pytest.raises(Exception, match="Export format must be one of csv, jsonl."):
+        bank_system.export_statements(year_month, str(csv_path), 'xml')
+
+
+def test_journal_and_snapshot_recovery(tmp_path):
+    bank_system = BankSystem(str(tmp_path))
+    bank_system.define_interest_rule("20240101 RULE01 2.00")
+    for txn in ['20240101 AC001 d 1000.00', '20240110 AC001 w 200.00', '20240105 AC002 d 99.99']:
+        bank_system.handle_transaction(txn)
+    bank_system.snapshot()
+    bank_system.define_interest_rule("20240115 RULE02 3.00")
+    bank_system.handle_transaction('20240120 AC001 d 500.00')
+    accruals = {account: dict(details["accrual"].months) for account, details in bank_system.accounts.items()}
+    bank_system.close_journal()
+    with open(tmp_path / 'journal.bin', 'ab') as journal:
+        journal.write(b'T\x01\x02')  # Record torn by a crash
+
+    recovered = BankSystem(str(tmp_path))
+    assert recovered.records_since_snapshot == 2
+    assert {account: details["accrual"].months for account, details in recovered.accounts.items()} == accruals
+    assert recovered.accounts["AC001"]["balance"] == 1300.0
+    assert [row["id"] for row in recovered.accounts["AC001"]["transactions"]] == \
+           ['20240101-1', '20240110-1', '20240120-1']
+    assert [rule["rule_id"] for rule in recovered.interest_rules] == ["RULE01", "RULE02"]
+    assert recovered.get_daily_withdrawals("AC001", datetime(2024, 1, 10)) == {"amount": 20000, "count": 1}
+    assert recovered.handle_show_transaction_and_interest('AC001 202401') == 2.32
+    recovered.handle_transaction('20240105 AC002 d 0.01')
+    assert recovered.accounts["AC002"]["transactions"][-1]["id"] == '20240105-2'
+    recovered.accounts["AC002"]["accrual"].months[(2024, 2)] = -3 * 10 ** 30  # Past int64
+    recovered.snapshot()
+    recovered.close_journal()
+    reloaded = BankSystem(str(tmp_path))
+    assert reloaded.accounts["AC002"]["balance"] == 100.0
+    assert reloaded.accounts["AC002"]["accrual"].months == recovered.accounts["AC002"]["accrual"].months
+    assert reloaded.accounts["AC002"]["accrual"].day == datetime(2024, 1, 5).toordinal()
+
+
+def test_recover_journal_only_reads(tmp_path):
+    BankSystem(str(tmp_path)).handle_transaction('20240101 AC001 d 5.00')
+    size = os.path.getsize(tmp_path / 'journal.bin')
+    for _ in range(2):
+        reader = BankSystem()
+        reader.quiet = True
+        reader.recover_journal(str(tmp_path))
+        reader.handle_transaction('20240101 AC002 d 100.00')
+        assert [row["id"] for row in reader.accounts["AC002"]["transactions"]] == ['20240101-2']
+    assert os.path.getsize(tmp_path / 'journal.bin') == size
+    assert list(BankSystem(str(tmp_path)).accounts) == ["AC001"]
+    with pytest.raises(Exception, match="Data directory does not exist."):
+        BankSystem().recover_journal(str(tmp_path / 'missing'))
+
+
+def test_background_snapshot(tmp_path):
+    bank_system = BankSystem(str(tmp_path))
+    bank_system.snapshot_interval = 3
+    for day in range(1, 8):
+        bank_system.handle_transaction(f'202401{day:02d} AC001 d 10.00')
+    bank_system.close_journal()
+    assert any(name.startswith('snapshot') for name in os.listdir(tmp_path))
+
+    recovered = BankSystem(str(tmp_path))
+    assert recovered.records_since_snapshot < 3
+    assert recovered.accounts["AC001"]["balance"] == 70.0
+    recovered.close_journal()
+
+
+def test_snapshot_while_a_thread_opens_an_account(tmp_path):
+    class PausingWithdrawals(dict):
+        def __iter__(self):
+            paused.set()
+            resume.wait(5)
+            return super().__iter__()
+
+    bank_system = BankSystem(str(tmp_path))
+    bank_system.quiet = True
+    for account in ('AC0', 'AC1'):
+        bank_system.handle_transaction(f'20240101 {account} d 10.00')
+    bank_system.accounts['AC0']['withdrawals_by_day'] = PausingWithdrawals()
+    paused, resume, errors = threading.Event(), threading.Event(), []
+
+    def snapshot():
+        try:
+            bank_system.snapshot()
+        except Exception as err:
+            errors.append(err)
+
+    snapshotter = threading.Thread(target=snapshot)
+    snapshotter.start()
+    paused.wait(5)
+    opener = threading.Thread(target=bank_system.apply_transaction, args=(datetime(2024, 1, 2), 'AC2', 'd', 100))
+    opener.start()
+    opener.join(0.2)  # Waits for the snapshot to release the book
+    resume.set()
+    snapshotter.join()
+    opener.join()
+    bank_system.close_journal()
+    assert errors == []
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+    assert sorted(BankSystem(str(tmp_path)).accounts) == ['AC0', 'AC1', 'AC2']
+
+
+def test_sqlite_storage_matches_memory(tmp_path):
+    storage = SqliteStorage(str(tmp_path / 'bank.db'), batch_size=3)
+    books = [BankSystem(), BankSystem(storage=storage)]
+    transactions = ['20231215 AC001 d 5000.00', '20240110 AC001 w 200.00', '20240120 AC001 d 500.00',
+                    '20240105 AC001 w 2500.00', '20240105 AC001 w 300.00', '20231220 AC002 d 80.25',
+                    '20240201 AC002 w 0.25', '20240105 AC001 d 1.11']
+    year_month = datetime(2024, 1, 1)
+    results = []
+    for bank_system in books:
+        bank_system.quiet = True
+        bank_system.define_interest_rule("20231201 RULE01 2.25")
+        for txn in transactions:
+            bank_system.handle_transaction(txn)
+        bank_system.define_interest_rule("20240115 RULE02 3.10")
+        with pytest.raises(Exception, match="Transaction limit exceeded"):
+            bank_system.handle_transaction("20240105 AC001 w 200.01")
+        results.append((
+            {account: details["balance"] for account, details in bank_system.accounts.items()},
+            bank_system.get_daily_withdrawals("AC001", datetime(2024, 1, 5)),
+            bank_system.get_statement("AC001 202401"), bank_system.get_statement("AC002 202402"),
+            bank_system.calculate_eom_interest(year_month), bank_system.run_month_end(year_month, workers=1),
+            bank_system.get_range_statement("AC001 YTD 202403"),
+            list(bank_system.iter_statement_rows(year_month)),
+            [dict(row) for row in bank_system.accounts["AC001"]["transactions"]],
+        ))
+    assert results[0] == results[1]
+    with pytest.raises(Exception, match="Journal and snapshots need the memory storage"):
+        books[1].open_journal(str(tmp_path / 'data'))
+    books[1].close_storage()
+    reopened = BankSystem(storage=SqliteStorage(str(tmp_path / 'bank.db')))
+    for rule in ["20231201 RULE01 2.25", "20240115 RULE02 3.10"]:
+        reopened.define_interest_rule(rule)
+    assert reopened.get_statement("AC001 202401") == results[0][2]
+    reopened.handle_transaction("20240105 AC003 d 5")
+    assert reopened.accounts["AC003"]["transactions"][-1]["id"] == "20240105-4"
+    reopened.close_storage()
+
+
+def test_sqlite_limit_check_keeps_batch_and_failed_flush_rolls_back(tmp_path):
+    storage = SqliteStorage(str(tmp_path / 'bank.db'), pool_size=1, batch_size=100)
+    bank_system = BankSystem(storage=storage)
+    bank_system.quiet = True
+    for txn in ['20240105 AC001 d 5000.00', '20240105 AC001 w 100.00', '20240105 AC001 w 50.00']:
+        bank_system.handle_transaction(txn)
+    assert len(storage.pending) == 3
+    assert bank_system.get_daily_withdrawals("AC001", datetime(2024, 1, 5)) == {"amount": 15000, "count": 2}
+    assert len(storage.pending) == 3
+
+    storage.append(storage.pending[0])  # Duplicate key fails the batch
+    with pytest.raises(Exception, match="UNIQUE"):
+        storage.flush()
+    assert len(storage.pending) == 4
+    storage.pending.pop()
+    storage.flush()
+    assert storage.query('SELECT COUNT(*) FROM transactions', ()) == [(3,)]
+    storage.close()
+
+
+def test_quiet_mode_skips_statement_echo(bank_system, caplog):
+    with caplog.at_level(logging.INFO, logger="MyLogger"):
+        bank_system.handle_transaction("20240101 AC001 d 1000")
+        bank_system.handle_transaction("20240102 AC001 d 10")
+        assert len(caplog.records) == 2
+        assert caplog.records[-1].getMessage().count('\n') == 2
+        bank_system.quiet = True
+        bank_system.handle_transaction("20240103 AC001 d 10")
+        assert len(caplog.records) == 2
+
+
+def test_stats(bank_system):
+    stats.reset()
+    bank_system.handle_transaction("20240101 AC001 d 1000")
+    assert bank_system.get_stats()["operations"] == {}
+    bank_system.handle_stats("on")
+    try:
+        bank_system.define_interest_rule("20240101 RULE01 2.0")
+        bank_system.handle_transaction("20240105 AC001 w 100")
+        bank_system.handle_show_transaction_and_interest("AC001 202401")
+        bank_system.handle_stats("")
+    finally:
+        bank_system.handle_stats("OFF")
+    assert not stats.enabled
+    with pytest.raises(Exception, match="Enter on, off or blank."):
+        bank_system.handle_stats("maybe")
+    current = bank_system.get_stats()
+    assert current["operations"]["handle_transaction"]["calls"] == 1
+    assert current["operations"]["add_transaction"]["calls"] == 1
+    assert current["operations"]["calculate_interval_interest"]["calls"] == 1
+    assert current["operations"]["handle_show_transaction_and_interest"]["total_ms"] > 0
+    assert current["sizes"] == {"accounts": 1, "transactions": 2, "interest_rules": 1, "statement_cache": 1}
+
+
+def test_server_concurrent_clients(bank_system):
+    async def send(port, requests):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        responses = []
+        for request in requests:
+            writer.write(request.encode() + b'\n')
+            lines = []
+            while (line := await reader.readline()) != b'\n':
+                lines.append(line.decode().rstrip('\n'))
+            responses.append(lines)
+        writer.close()
+        return responses
+
+    async def scenario():
+        bank_server = BankServer(bank_system, workers=4)
+        server = await bank_server.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            await send(port, ['I 20240101 RULE01 3.65'])
+            clients = [send(port, [f'T 20240101 AC{client % 2} d 10.00'] * 25) for client in range(8)]
+            await asyncio.gather(*clients)
+            responses = await send(port, ['P AC0 202401', 'T 20240101 AC9 w 1', 'P NOPE 202401', 'S', 'X'])
+            return responses, bank_server.account_locks
+
+    (statement, withdrawal, _, stats_line, unknown), account_locks = asyncio.run(scenario())
+    assert account_locks == {}
+    assert json.loads(stats_line[0])["sizes"]["transactions"] == 200
+    assert bank_system.accounts["AC0"]["balance"] == bank_system.accounts["AC1"]["balance"] == 1000.0
+    ids = [row["id"] for account in ("AC0", "AC1") for row in bank_system.accounts[account]["transactions"]]
+    assert len(set(ids)) == 200
+    assert statement[-1].split('|')[4].strip() == '3.1'
+    assert withdrawal == ['ERROR Provided account does not exist.']
+    assert unknown == ['ERROR Command must be one of T, I, P, S or Q.']
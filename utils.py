@@ -1,4 +1,5 @@
 import datetime
+from decimal import Decimal, InvalidOperation
 
 
 def validate_time_format(date):
@@ -6,3 +7,37 @@ def validate_time_format(date):
         return datetime.datetime.strptime(date, "%Y%m%d")
     except ValueError:
         raise Exception('Incorrect format of time.')
+
+
+def to_minor_units(value, places: int, error: str) -> int:
+    """
+    Exact integer count of 10^-places units in a decimal string, e.g. "12.34" with 2 places is 1234
+    :param value: Decimal string
+    :param places: Decimal places allowed
+    :param error: Message raised when value has more decimal places
+    """
+    try:
+        value = Decimal(value).scaleb(places)
+    except InvalidOperation:
+        raise Exception('Incorrect format of number.')
+    if not value.is_finite():
+        raise Exception('Incorrect format of number.')
+    if value != value.to_integral_value():
+        raise Exception(error)
+    return int(value)
+
+
+def to_cents(amount) -> int:
+    """
+    Amount in cents
+    :param amount: Decimal string
+    """
+    return to_minor_units(amount, 2, 'Amount must be at most 2 decimal places.')
+
+
+def from_cents(cents: int) -> float:
+    """
+    Amount in dollars for display and the float based API
+    :param cents
+    """
+    return cents / 100